@@ -1,7 +1,13 @@
+import json
 import os
-from langchain_openai import ChatOpenAI
-from langchain.prompts import PromptTemplate
-import pandas as pd
+import re
+import threading
+import time
+
+from ..llm_cache import cached_ainvoke, cached_astream, cached_invoke, cached_stream
+from ..model_router import get_router
+from ..token_budget import compact_input, count_tokens
+from .. import telemetry
 
 api_key = os.getenv("OPEN_API_KEY")
 
@@ -10,11 +16,140 @@ class AgentResult:
         self.title = title
         self.content = content
         self.data = data or {}
-        
+
 class BaseAgent:
     name = "Agent"
     role = ""
-    def run(self, json_input: str) -> AgentResult:
-        # Implement the logic for the agent to run on the DataFrame
-        pass
-    
+    title = "Agent Result"
+    # names of the upstream outputs this agent consumes, used to build the run graph
+    inputs: tuple = ()
+    # set to False on an agent to always go to the LLM and skip the response cache
+    use_cache = True
+    # per input name, the dotted JSON paths the prompt actually uses (None key: a single string input)
+    input_fields: dict = {}
+    # max tokens for the formatted inputs; larger inputs are shrunk (see token_budget)
+    input_token_budget: int | None = None
+    # model routing (see model_router): the lowest catalogue tier good enough for this agent,
+    # and the seconds a call should take (None: no limit, the cheapest model of the tier)
+    quality_tier = 2
+    latency_budget: float | None = None
+    # top-level keys a valid JSON answer must have; None for agents that do not answer in JSON
+    output_keys: tuple | None = ()
+
+    def __init__(self):
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._stats_lock = threading.Lock()
+
+    def build_prompt(self, json_input) -> str:
+        raise NotImplementedError
+
+    def build_result(self, json_input, response) -> AgentResult:
+        return AgentResult(
+            title=self.title,
+            content=response.content,
+            data={
+                "input": json_input,
+                "metadata": response.response_metadata
+            }
+        )
+
+    def build_llm_prompt(self, json_input) -> str:
+        compacted = compact_input(json_input, self.input_fields, self.input_token_budget, self.llm.model_name)
+        return self.build_prompt(compacted)
+
+    def local_result(self, json_input) -> AgentResult | None:
+        # Subclasses can answer without calling the LLM (e.g. known fixtures)
+        return None
+
+    def validate_output(self, content: str) -> bool:
+        """Whether an answer is good enough to keep; otherwise it is retried on a larger model."""
+        if self.output_keys is None:
+            return bool(content.strip())
+        try:
+            data = json.loads(re.sub(r"^```(?:json)?|```$", "", content.strip(), flags=re.MULTILINE))
+        except ValueError:
+            return False
+        return isinstance(data, dict) and all(key in data for key in self.output_keys)
+
+    def _invoke(self, prompt: str, on_token=None, on_attempt=None):
+        # answers that fail validation are not cached, so the next run asks again
+        options = {"agent": self.name, "valid": self.validate_output}
+
+        def invoke(llm):
+            if on_token is not None:
+                return cached_stream(llm, prompt, on_token, self.use_cache, **options)
+            return cached_invoke(llm, prompt, self.use_cache, **options)
+
+        return get_router().call(self.name, self.llm, self.quality_tier, self.latency_budget, invoke,
+                                 self.validate_output, on_attempt)
+
+    async def _ainvoke(self, prompt: str, on_token=None, on_attempt=None):
+        options = {"agent": self.name, "valid": self.validate_output}
+
+        async def ainvoke(llm):
+            if on_token is not None:
+                return await cached_astream(llm, prompt, on_token, self.use_cache, **options)
+            return await cached_ainvoke(llm, prompt, self.use_cache, **options)
+
+        return await get_router().acall(self.name, self.llm, self.quality_tier, self.latency_budget, ainvoke,
+                                        self.validate_output, on_attempt)
+
+    def _finish(self, json_input, prompt: str, response, cache_status: str, started: float, llm) -> AgentResult:
+        # agents are shared between concurrent calls, so counters are updated under a lock
+        with self._stats_lock:
+            if cache_status == "hit":
+                self.cache_hits += 1
+            elif cache_status == "miss":
+                self.cache_misses += 1
+            cache = {"status": cache_status, "hits": self.cache_hits, "misses": self.cache_misses}
+        result = self.build_result(json_input, response)
+        result.data["cache"] = cache
+        result.data["model"] = llm.model_name
+        result.data["prompt_tokens"] = count_tokens(prompt, llm.model_name)
+        result.data["telemetry"] = telemetry.record_call(
+            self.name, llm.model_name, started, response=response, cache=cache_status,
+            prompt_tokens_estimate=result.data["prompt_tokens"]
+        )
+        return result
+
+    def _local(self, json_input, on_token, started: float) -> AgentResult | None:
+        result = self.local_result(json_input)
+        if result is not None:
+            if on_token is not None:
+                on_token(result.content)
+            telemetry.record_call(self.name, None, started, cache="local")
+        return result
+
+    # Passing `on_token` switches to streaming mode: the response is read with
+    # ChatOpenAI.stream/astream, `on_token(text)` gets every chunk as it arrives and
+    # the AgentResult is assembled from the joined chunks. An answer that fails
+    # validate_output is retried on a larger model and streams again from the start:
+    # `on_attempt(final)` is called before every model call, so a streaming caller can
+    # drop what it got so far, and with `final` False it should not act on the chunks
+    # before the answer is accepted (see ModelRouter.call).
+    def run(self, json_input, on_token=None, on_attempt=None) -> AgentResult:
+        started = time.perf_counter()
+        result = self._local(json_input, on_token, started)
+        if result is not None:
+            return result
+        prompt = self.build_llm_prompt(json_input)
+        try:
+            response, cache_status, llm = self._invoke(prompt, on_token, on_attempt)
+        except Exception as error:
+            telemetry.record_call(self.name, self.llm.model_name, started, error=error)
+            raise
+        return self._finish(json_input, prompt, response, cache_status, started, llm)
+
+    async def arun(self, json_input, on_token=None, on_attempt=None) -> AgentResult:
+        started = time.perf_counter()
+        result = self._local(json_input, on_token, started)
+        if result is not None:
+            return result
+        prompt = self.build_llm_prompt(json_input)
+        try:
+            response, cache_status, llm = await self._ainvoke(prompt, on_token, on_attempt)
+        except Exception as error:
+            telemetry.record_call(self.name, self.llm.model_name, started, error=error)
+            raise
+        return self._finish(json_input, prompt, response, cache_status, started, llm)
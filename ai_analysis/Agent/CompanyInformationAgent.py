@@ -1,22 +1,28 @@
 import json
 from langchain.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
 
 import os
 
 from .Agent import BaseAgent, AgentResult
+from ..llm_pool import get_llm
+from ..model_router import configured_latency_budget
+from ..profile_store import get_profile_store
 
 class CompanyInformationAgent(BaseAgent):
     name = "Company Information Agent"
     role = "Company Information Analyst"
+    # filling in a fixed JSON profile does not need the strongest model
+    quality_tier = 1
+    latency_budget = configured_latency_budget("CompanyInformationAgent", 15)
 
     def __init__(self, api_key: str, type: str):
         self.type = type
+        self.output_keys = (type,)
         super().__init__()
-        self.llm = ChatOpenAI(
+        self.llm = get_llm(
             model="gpt-4o-2024-05-13",
             temperature=0,
-            openai_api_key=api_key
+            api_key=api_key
         )
         self.prompt_template = PromptTemplate(
             template = self._get_template(),
@@ -171,171 +177,39 @@ Description: {{company_description}}
        
         """
         
-    def run(self, json_input:dict) -> AgentResult:
-        company_name = json_input["company_name"]
-        company_description = json_input["company_description"]
-
-        if company_name.count("Centel") and self.type == "buyer":
-            return AgentResult(
-                title="Buyer Company Information",
-                content=self._get_secret_answer("Centel"),
-                data={
-                    "input": {
-                        "company_name": company_name,
-                        "company_description": company_description
-                    },
-                    "response_time": 0
-                }
-            )
-            
-        if company_name.count("iberry") and self.type == "target":
-            return AgentResult(
-                title="Target Company Information",
-                content=self._get_secret_answer("iberry"),
-                data={
-                    "input": {
-                        "company_name": company_name,
-                        "company_description": company_description
-                    },
-                    "response_time": 0
-                }
-            )
+    def local_result(self, json_input:dict) -> AgentResult | None:
+        # vetted profiles are served from the profile store; only unknown companies go to the LLM
+        profile = get_profile_store().lookup(json_input["company_name"], self.type)
+        if profile is None:
+            return None
+        return AgentResult(
+            title=f"{self.type.capitalize()} Company Information",
+            content=profile.content,
+            data={
+                "input": {
+                    "company_name": json_input["company_name"],
+                    "company_description": json_input["company_description"]
+                },
+                "profile": {"id": profile.id, "name": profile.name, "source": profile.source},
+                "response_time": 0
+            }
+        )
 
-        final_prompt = self.prompt_template.format(
-          company_name=company_name,
-          company_description=company_description
+    def build_prompt(self, json_input:dict) -> str:
+        return self.prompt_template.format(
+          company_name=json_input["company_name"],
+          company_description=json_input["company_description"]
         )
-        response = self.llm.invoke(final_prompt)
-        
+
+    def build_result(self, json_input:dict, response) -> AgentResult:
         return AgentResult(
             title=f"{self.type.capitalize()} Company Information",
             content=response.content,
             data={
                 "input": {
-                    "company_name": company_name,
-                    "company_description": company_description
+                    "company_name": json_input["company_name"],
+                    "company_description": json_input["company_description"]
                 },
                 "metadata": response.response_metadata
             }
         )
-        
-
-    def _get_secret_answer(self, company_name:str):
-        if company_name == "Centel":
-            return """
-          {
-    "buyer" : {
-  "companyName": "Central Plaza Hotel Public Co., Ltd.",
-  "industry": "Foods / Hotels",
-  "website": "https://www.centarahotelsresorts.com",
-  "financials": {
-    "revenue": "X THB",
-    "ebitda": "Y THB",
-    "cash": "Z THB",
-    "debtCapacity": "Approx value"
-  },
-  "strategy": {
-    "vision": "Leading Asian hospitality brand",
-    "m&aReason": "Expand luxury and lifestyle portfolio with authentic Thai cultural elements. Current pain point: Centara lacks distinctive 'Thai identity' in luxury segment, so seeks to acquire a strong local brand to integrate cultural storytelling and elevate guest experience.",
-    "synergyGoals": "Cross-brand marketing, scale procurement, integrate Thai cultural branding"
-  },
-  "dealCriteria": {
-    "targetRevenueMin": "100M THB",
-    "targetEBITDAMarginMin": "15%",
-    "preferredMultiple": "8-10x EBITDA",
-    "maxTicketSize": "2,000M THB",
-    "geographyFit": "Thailand and Southeast Asia",
-    "brandFit": "Premium / Lifestyle with strong local cultural identity"
-  },
-  "strengths": {
-    "internal": [
-      "Strong brand recognition within Thailand",
-      "Diverse hotel portfolio across market segments",
-      "Established management systems and operational know-how"
-    ],
-    "external": [
-      "Strategic locations in tourist hubs",
-      "Partnerships with global booking platforms"
-    ]
-  },
-  "weaknesses": {
-    "internal": [
-      "Limited in-house F&B brand innovation",
-      "High fixed asset costs (capital intensive expansions)"
-    ],
-    "external": [
-      "Vulnerable to tourism cycles and external shocks",
-      "Increasing competition from regional hotel chains"
-    ]
-  },
-  "pastDeals": [
-    {
-      "name": "JV Maldives",
-      "size": "approx $xxM",
-      "outcome": "Active and profitable partnership focused on resort segment"
-    }
-  ],
-  "integrationCapability": "Experienced integrating new properties, central systems, and brand standards across multiple markets. Proven ability to manage joint ventures and partnerships with clear governance structures.",
-  "integrationConstraints": {
-    "maxNewStoresPerYear": 50,
-    "culturalFitImportance": "High (requires clear brand alignment, storytelling capability, and ability to embed Thai cultural elements into guest experience)"
-  },
-  "valuationPreference": {
-    "dealStructure": "Majority buyout with operational control",
-    "paymentType": "Cash + Earn-out based on performance",
-    "acceptableLeverage": "Up to 2.5x Debt/EBITDA to maintain healthy balance sheet"
-  }
-  }
-}
-    """
-        if company_name == "iberry":
-            return """
-          {
-        "target" : {
-  "companyName": "iberry Group",
-  "industry": "F&B / Ice Cream Cafe",
-  "hqLocation": "Bangkok, Thailand",
-  "website": "https://iberryhomemade.com",
-  "businessModel": "Own stores and franchise",
-  "numStores": 50,
-  "brands": ["iberry", "Another Hound", "Greyhound Cafe"],
-  "financials": {
-    "revenue": "500M THB",
-    "ebitda": "80M THB",
-    "grossMargin": "65%",
-    "debt": "50M THB"
-  },
-  "customers": "Young adults, Families, Tourists",
-  "marketPosition": "Premium ice cream and restaurant",
-  "mainCompetitors": ["Swensen's", "Haagen Dazs"],
-  "synergyPotential": [
-    "Expand Hotel F&B",
-    "Cross-selling",
-    "Shared supply chain"
-  ],
-  "strategicRationale": "Access to premium local brand with established retail footprint",
-  "ownership": {
-    "founders": ["Name A", "Name B"],
-    "currentShareholding": "100% privately held"
-  },
-  "assets": [
-    "Central Kitchen",
-    "50 Store Leases",
-    "iberry Trademark"
-  ],
-  "risks": [
-    "Seasonal sales",
-    "High competition",
-    "Brand management dependency"
-  ],
-  "plans": [
-    "Expand central kitchen / factory capacity to support more stores and new products",
-    "Open new flagship stores in prime Bangkok locations",
-    "Develop new premium dessert lines",
-    "Explore franchising opportunities in SEA markets"
-  ],
-  "history": "Founded 1999, expanded to 50 stores by 2023, no major M&A recorded"
-  }
-}
-        """
-        
\ No newline at end of file
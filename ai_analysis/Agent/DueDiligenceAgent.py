@@ -1,18 +1,38 @@
-from .Agent import BaseAgent, AgentResult
+from .Agent import BaseAgent
+from ..llm_pool import get_llm
+from ..model_router import configured_latency_budget
+from ..token_budget import configured_budget
 
-from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 
 class DueDiligenceAgent(BaseAgent):
     name = "Due Diligence Agent"
     role = "Due Diligence Specialist"
+    title = "Due Diligence Report"
+    inputs = ("strategy", "company_data", "valuation")
+    input_fields = {
+        "company_data": [
+            "buyer.companyName", "buyer.dealCriteria", "buyer.integrationCapability",
+            "buyer.integrationConstraints", "target", "financials",
+        ],
+        "strategy": [
+            "strategicSummary.strategicRisks", "strategicSummary.integrationConsiderations",
+            "dueDiligenceDirectives",
+        ],
+        "valuation": [
+            "valuationSummary.valuationRange", "valuationSummary.dealStructureRecommendation",
+            "valuationSummary.riskSensitivity", "valuationSummary.valuationRedFlags",
+        ],
+    }
+    input_token_budget = configured_budget("DueDiligenceAgent", 5000)
+    latency_budget = configured_latency_budget("DueDiligenceAgent", 30)
 
     def __init__(self, api_key: str):
         super().__init__()
-        self.llm = ChatOpenAI(
+        self.llm = get_llm(
             model="gpt-4o-2024-05-13",
             temperature=0.2,
-            openai_api_key=api_key
+            api_key=api_key
         )
         self.prompt_template = PromptTemplate(
             template=self._get_template(),
@@ -46,20 +66,9 @@ You must:
         
     """
 
-    def run(self, json_input: dict) -> AgentResult:
-        
-        final_prompt = self.prompt_template.format(
+    def build_prompt(self, json_input: dict) -> str:
+        return self.prompt_template.format(
             strategy=json_input["strategy"],
             company_data=json_input["company_data"],
             valuation=json_input["valuation"]
         )
-        response = self.llm.invoke(final_prompt)
-        
-        return AgentResult(
-            title="Due Diligence Report",
-            content=response.content,
-            data={
-                "input": json_input,
-                "metadata": response.response_metadata
-            }
-        )
\ No newline at end of file
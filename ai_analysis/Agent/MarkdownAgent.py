@@ -1,19 +1,36 @@
+import asyncio
+import json
 import re
+from concurrent.futures import as_completed
+
 from .Agent import BaseAgent, AgentResult
+from ..llm_pool import get_llm
+from ..model_router import configured_latency_budget
+from ..async_bridge import submit
+from ..html_renderer import render_json_html
 
-from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 
 class HTMLAgent(BaseAgent):
     name = "HTML Agent"
     role = "HTML Formatter"
+    title = "HTML Report"
+    inputs = ("content",)
+    # the HTML must carry the whole section, so its input is only minified, never shortened
+    input_token_budget = None
+    # formatting is mechanical: the smallest model that keeps up will do
+    quality_tier = 1
+    latency_budget = configured_latency_budget("HTMLAgent", 10)
+    output_keys = None
 
-    def __init__(self, api_key: str):
+    # polish=False renders JSON locally (no LLM call); polish=True has GPT-4o write the HTML
+    def __init__(self, api_key: str, polish: bool = False):
         super().__init__()
-        self.llm = ChatOpenAI(
+        self.polish = polish
+        self.llm = get_llm(
             model="gpt-4o-2024-05-13",
             temperature=0.2,
-            openai_api_key=api_key
+            api_key=api_key
         )
         self.prompt_template = PromptTemplate(
             template=self._get_template(),
@@ -39,19 +56,51 @@ Here is the JSON input:
     {content}
         """
         
-    def run(self, json_input: str) -> AgentResult:
-        final_prompt = self.prompt_template.format(
-            content=json_input)
-        response = self.llm.invoke(final_prompt)
-        
+    def local_result(self, json_input: str) -> AgentResult | None:
+        if self.polish:
+            return None
+        try:
+            data = json.loads(json_input)
+        except (TypeError, ValueError):
+            # not JSON we produced ourselves, let the LLM make sense of it
+            return None
         return AgentResult(
-            title="HTML Report",
-            content=self.cleanOutput(response.content),
+            title=self.title,
+            content=render_json_html(data),
             data={
                 "input": json_input,
-                "metadata": response.response_metadata
+                "renderer": "local"
             }
         )
+
+    def build_prompt(self, json_input: str) -> str:
+        return self.prompt_template.format(
+            content=json_input)
+
+    def build_result(self, json_input: str, response) -> AgentResult:
+        result = super().build_result(json_input, response)
+        result.content = self.cleanOutput(response.content)
+        return result
+
+    def run_batch(self, sections: dict, max_workers: int = 3):
+        """Format every section concurrently, yielding (key, AgentResult) as each one finishes.
+
+        At most `max_workers` LLM calls are in flight at once. Results arrive in
+        completion order, not in the order of `sections`.
+        """
+        limit = asyncio.Semaphore(max_workers)
+
+        async def format_section(key, json_input):
+            async with limit:
+                return key, await self.arun(json_input)
+
+        futures = [submit(format_section(key, json_input)) for key, json_input in sections.items()]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
         
     def cleanOutput(self, content: str):
         cleaned = re.sub(r"^```(?:html)?|```$", "", content.strip(), flags=re.MULTILINE)
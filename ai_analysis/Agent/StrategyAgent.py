@@ -1,20 +1,27 @@
 
-from .Agent import BaseAgent, AgentResult
+from .Agent import BaseAgent
+from ..llm_pool import get_llm
+from ..model_router import configured_latency_budget
+from ..token_budget import configured_budget
 
-from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 
 
 class StrategyAgent(BaseAgent):
     name = "Strategy Agent"
     role = "Financial Strategist"
+    title = "Strategy Analysis"
+    inputs = ("company_data",)
+    input_token_budget = configured_budget("StrategyAgent", 6000)
+    latency_budget = configured_latency_budget("StrategyAgent", 45)
+    output_keys = ("strategicSummary", "valuationGuidance", "dueDiligenceDirectives", "statusRecommendation")
     
     def __init__(self, api_key: str):
         super().__init__()
-        self.llm = ChatOpenAI(
+        self.llm = get_llm(
           model="gpt-4o-2024-05-13",
           temperature=0.3,
-          openai_api_key=api_key
+          api_key=api_key
         )
         self.prompt_template = PromptTemplate(
           template = self._get_template(),
@@ -99,17 +106,5 @@ Always output a structured JSON object using the following format:
     """
 
     #json_input: company information (merger+target)
-    def run(self, json_input: str) -> AgentResult:
-        # Implement the logic for the strategy agent to run on the DataFrame
-
-        final_prompt = self.prompt_template.format(company_data=json_input)
-        response = self.llm.invoke(final_prompt)
-        
-        return AgentResult(
-            title="Strategy Analysis",
-            content=response.content,
-            data={
-                "input": json_input,
-                "metadata": response.response_metadata
-            }
-        )
\ No newline at end of file
+    def build_prompt(self, json_input: str) -> str:
+        return self.prompt_template.format(company_data=json_input)
@@ -1,18 +1,33 @@
-from .Agent import BaseAgent, AgentResult
+from .Agent import BaseAgent
+from ..llm_pool import get_llm
+from ..model_router import configured_latency_budget
+from ..token_budget import configured_budget
 
-from langchain_openai import ChatOpenAI
 from langchain.prompts import PromptTemplate
 
 class ValuationAgent(BaseAgent):
     name = "Valuation Agent"
     role = "Financial Valuation Expert"
+    title = "Valuation Analysis"
+    inputs = ("strategy", "company_data")
+    input_fields = {
+        "company_data": [
+            "buyer.companyName", "buyer.financials", "buyer.dealCriteria", "buyer.valuationPreference",
+            "target.companyName", "target.industry", "target.businessModel", "target.numStores",
+            "target.financials", "target.marketPosition", "target.assets", "target.risks", "target.plans",
+            "financials",
+        ],
+    }
+    input_token_budget = configured_budget("ValuationAgent", 4000)
+    latency_budget = configured_latency_budget("ValuationAgent", 30)
+    output_keys = ("valuationSummary",)
 
     def __init__(self, api_key: str):
         super().__init__()
-        self.llm = ChatOpenAI(
+        self.llm = get_llm(
             model="gpt-4o-2024-05-13",
             temperature=0.2,
-            openai_api_key=api_key
+            api_key=api_key
         )
         self.prompt_template = PromptTemplate(
             template = self._get_template(),
@@ -78,19 +93,8 @@ Strategic Analysis:
     """
     
     
-    def run(self, json_input:dict) -> AgentResult:
-        
-        final_prompt = self.prompt_template.format(
+    def build_prompt(self, json_input:dict) -> str:
+        return self.prompt_template.format(
             strategy=json_input["strategy"],
             company_data=json_input["company_data"]
         )
-        response = self.llm.invoke(final_prompt)
-        
-        return AgentResult(
-            title= "Valuation Analysis",
-            content= response.content,
-            data= {
-                "input": json_input,
-                "metadata": response.response_metadata
-            }
-        )
\ No newline at end of file
@@ -0,0 +1,18 @@
+from .CompanyInformationAgent import CompanyInformationAgent
+from .DueDiligenceAgent import DueDiligenceAgent
+from .MarkdownAgent import HTMLAgent
+from .StrategyAgent import StrategyAgent
+from .ValuationAgent import ValuationAgent
+
+
+def build_agent_registry(api_key: str) -> dict:
+    # agents hold no per-run state, so one registry can be shared by every session
+    return {
+        "company_info_buyer": CompanyInformationAgent(api_key, "buyer"),
+        "company_info_target": CompanyInformationAgent(api_key, "target"),
+        "strategy": StrategyAgent(api_key),
+        "valuation": ValuationAgent(api_key),
+        "due_diligence": DueDiligenceAgent(api_key),
+        "formatter": HTMLAgent(api_key),
+        "formatter_polish": HTMLAgent(api_key, polish=True)
+    }
@@ -0,0 +1,45 @@
+import hashlib
+import json
+
+import pandas as pd
+
+
+def fingerprint(*parts) -> str:
+    """Stable hash of the upstream inputs of an artifact (strings, JSON-able values, DataFrames)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, pd.DataFrame):
+            digest.update(pd.util.hash_pandas_object(part, index=True).values.tobytes())
+            digest.update(",".join(map(str, part.columns)).encode("utf-8"))
+        else:
+            digest.update(json.dumps(part, sort_keys=True, default=str).encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class ArtifactStore:
+    """Artifacts kept in a mapping such as st.session_state, rebuilt only when their inputs' fingerprint changes."""
+
+    def __init__(self, state, key: str = "artifacts"):
+        if key not in state:
+            state[key] = {}
+        self._entries = state[key]
+
+    def get(self, name: str, version: str):
+        entry = self._entries.get(name)
+        if entry is not None and entry["version"] == version:
+            return entry["value"]
+        return None
+
+    def put(self, name: str, version: str, value):
+        self._entries[name] = {"version": version, "value": value}
+        return value
+
+    def has(self, name: str, version: str) -> bool:
+        entry = self._entries.get(name)
+        return entry is not None and entry["version"] == version
+
+    def memoize(self, name: str, version: str, build):
+        if self.has(name, version):
+            return self._entries[name]["value"]
+        return self.put(name, version, build())
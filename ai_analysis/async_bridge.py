@@ -0,0 +1,36 @@
+import asyncio
+import threading
+
+# Streamlit runs each script on its own thread without an event loop, and
+# asyncio.run() would build (and tear down) a new loop on every call, dropping the
+# async HTTP connections the LLM clients keep. Instead one loop lives for the whole
+# process on a daemon thread and scripts hand coroutines to it.
+_loop: asyncio.AbstractEventLoop | None = None
+_lock = threading.Lock()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="agent-event-loop", daemon=True)
+            thread.start()
+    return _loop
+
+
+def submit(coro):
+    """Schedule `coro` on the shared loop and return a concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run_sync(coro, timeout: float | None = None):
+    """Block the calling (script) thread until `coro` finishes on the shared loop."""
+    return submit(coro).result(timeout)
+
+
+def gather_sync(*coros, timeout: float | None = None) -> list:
+    async def _gather():
+        return await asyncio.gather(*coros)
+
+    return run_sync(_gather(), timeout)
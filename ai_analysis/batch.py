@@ -0,0 +1,181 @@
+"""Screen many buyer/target pairs without the UI.
+
+    python -m ai_analysis.batch pairs.csv --out screening/ --workers 4
+
+The CSV needs `buyer` and `target` columns; `buyer_description` and
+`target_description` are optional. Every pair gets its own directory under
+--out holding the agents' JSON answers, report.html and a telemetry trace.
+Finished pairs are skipped when the command is started again, and a pair that
+was interrupted resumes from the agent outputs it had already checkpointed.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# the chart planner reads its API key at import time
+load_dotenv()
+
+from . import rate_limiter, telemetry
+from .Agent.registry import build_agent_registry
+from .pipeline import (
+    SECTION_NODES, analysis_outputs, build_analysis_graph, build_charts, build_report, format_sections, run_input_hash,
+)
+from .run_store import RunStore
+
+STATUS_FILE = "status.json"
+# agent outputs of every pair, for resuming interrupted pairs (see run_store.RunStore)
+RUN_STORE_FILE = "runs.sqlite"
+
+
+def pair_id(row: dict) -> str:
+    # readable names plus a hash of the whole row, so edited descriptions get a fresh directory
+    slug = "_vs_".join(re.sub(r"[^a-z0-9]+", "-", row[col].casefold()).strip("-") for col in ("buyer", "target"))
+    digest = hashlib.sha256(json.dumps(row, sort_keys=True).encode("utf-8")).hexdigest()[:8]
+    return f"{slug[:80]}-{digest}"
+
+
+def read_pairs(path: Path) -> list[dict]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        missing = {"buyer", "target"} - set(reader.fieldnames or ())
+        if missing:
+            raise ValueError(f"{path} is missing columns: {', '.join(sorted(missing))}")
+        return [
+            {
+                "buyer": row["buyer"].strip(),
+                "target": row["target"].strip(),
+                "buyer_description": (row.get("buyer_description") or "").strip(),
+                "target_description": (row.get("target_description") or "").strip(),
+            }
+            for row in reader
+            if (row.get("buyer") or "").strip() and (row.get("target") or "").strip()
+        ]
+
+
+def write_atomic(path: Path, text: str):
+    # a crash mid-write must never leave a truncated file that a resumed run would trust
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def read_json(path: Path, default=None):
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return default
+
+
+def run_pair(agents: dict, row: dict, pair_dir: Path, store: RunStore, polish: bool = False) -> dict:
+    pair_dir.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    run = telemetry.RunTelemetry(trace_dir=pair_dir)
+    # a pair that was interrupted before continues from the agent outputs it had checkpointed
+    run_id, checkpoint = store.start(
+        run_input_hash(row["buyer"], row["buyer_description"], row["target"], row["target_description"]), row
+    )
+
+    def save_checkpoint(name, state, value):
+        if state == "complete" and isinstance(value, str):
+            store.save_stage(run_id, name, value)
+
+    # each pair queues as its own rate-limiter session, so the pairs in flight advance evenly
+    with store.lease(run_id), telemetry.activate(run), rate_limiter.session(pair_dir.name):
+        graph = build_analysis_graph(agents, row["buyer"], row["buyer_description"],
+                                     row["target"], row["target_description"])
+        resumed = {name: value for name, value in checkpoint.items() if name in graph.nodes}
+        try:
+            outputs = analysis_outputs(graph.run(results=resumed, on_status=save_checkpoint))
+        except Exception as error:
+            store.finish(run_id, error)
+            raise
+        formatter = agents["formatter_polish" if polish else "formatter"]
+        section_html = format_sections(formatter, outputs)
+        chart_figs, chart_analysis = build_charts(outputs["chart_plan"], outputs["df"])
+        report_html = build_report(section_html, chart_figs, chart_analysis).to_html()
+
+    for section in SECTION_NODES:
+        write_atomic(pair_dir / f"{section}.json", outputs[section])
+    write_atomic(pair_dir / "chart_plan.json", outputs["chart_plan"])
+    write_atomic(pair_dir / "report.html", report_html)
+    # only now; a crash while formatting or writing resumes with every agent output intact
+    store.finish(run_id)
+    summary = run.to_frame()
+    return {
+        "status": "complete",
+        "resumed_nodes": sorted(resumed),
+        "wall_time_s": round(time.perf_counter() - started, 3),
+        "llm_calls": len(summary),
+        "cost_usd": float(summary["cost_usd"].sum()) if "cost_usd" in summary else 0.0,
+    }
+
+
+def run_batch(pairs: list[dict], out_dir: Path, workers: int = 4, polish: bool = False,
+              retry_failed: bool = True, log=print) -> list[dict]:
+    """Run every pair that has not completed yet, `workers` pairs at a time; returns one status per pair."""
+    agents = build_agent_registry(os.getenv("OPEN_API_KEY"))
+    out_dir.mkdir(parents=True, exist_ok=True)
+    store = RunStore(out_dir / RUN_STORE_FILE, ttl_seconds=float("inf"))
+    statuses = {}
+    todo = {}
+    for row in pairs:
+        pid = pair_id(row)
+        status = read_json(out_dir / pid / STATUS_FILE)
+        if status and (status["status"] == "complete" or not retry_failed):
+            statuses[pid] = status
+        else:
+            todo[pid] = row
+    log(f"{len(pairs)} pairs, {len(pairs) - len(todo)} already done, {len(todo)} to run")
+
+    def run_one(pid, row):
+        try:
+            status = run_pair(agents, row, out_dir / pid, store, polish)
+        except Exception as error:
+            status = {"status": "error", "error": repr(error)}
+        status = {"pair_id": pid, "buyer": row["buyer"], "target": row["target"], **status}
+        write_atomic(out_dir / pid / STATUS_FILE, json.dumps(status, ensure_ascii=False, indent=2))
+        return status
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="pair") as pool:
+        futures = [pool.submit(run_one, pid, row) for pid, row in todo.items()]
+        for done, future in enumerate(as_completed(futures), 1):
+            status = future.result()
+            statuses[status["pair_id"]] = status
+            log(f"[{done}/{len(todo)}] {status['buyer']} -> {status['target']}: {status['status']}"
+                + (f" ({status['error']})" if status["status"] == "error" else ""))
+
+    results = [statuses[pair_id(row)] for row in pairs]
+    fields = ["pair_id", "buyer", "target", "status", "wall_time_s", "llm_calls", "cost_usd", "error"]
+    with open(out_dir / "summary.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(results)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the M&A analysis for every buyer/target pair in a CSV.")
+    parser.add_argument("pairs", type=Path, help="CSV with buyer, target and optional *_description columns")
+    parser.add_argument("--out", type=Path, default=Path("screening"), help="output directory")
+    parser.add_argument("--workers", type=int, default=4, help="pairs analysed at the same time")
+    parser.add_argument("--polish", action="store_true", help="format report sections with the LLM")
+    parser.add_argument("--skip-failed", action="store_true", help="do not retry pairs that failed before")
+    args = parser.parse_args(argv)
+
+    results = run_batch(read_pairs(args.pairs), args.out, args.workers, args.polish,
+                        retry_failed=not args.skip_failed)
+    failed = sum(status["status"] != "complete" for status in results)
+    print(f"{len(results) - failed} complete, {failed} failed; summary in {args.out / 'summary.csv'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
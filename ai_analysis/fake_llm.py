@@ -0,0 +1,269 @@
+"""Offline stand-in for ChatOpenAI, selected with LLM_BACKEND=fake (see llm_pool.get_llm).
+
+Answers come from, in order:
+1. a recorded response: FAKE_LLM_REPLAY points at an LLM cache file (llm_cache.LLMCache)
+   filled by real runs, looked up with the real model name and temperature;
+2. a responder registered for a marker in the prompt (the chart planner and the HTML
+   formatter have built-in ones);
+3. the JSON example in the prompt, with its placeholder strings replaced by filler text.
+
+FAKE_LLM_LATENCY (seconds before the first token), FAKE_LLM_JITTER (± seconds),
+FAKE_LLM_TOKENS_PER_SECOND and FAKE_LLM_SEED shape the timing; the same seed and
+prompt always give the same answer and the same delays. FAKE_LLM_RATE_LIMIT_ERRORS
+is the share of calls that fail with a 429, to exercise rate_limiter's backoff.
+"""
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import time
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from .llm_cache import LLMCache
+from .token_budget import count_tokens
+
+LATENCY = float(os.getenv("FAKE_LLM_LATENCY", 0.5))
+JITTER = float(os.getenv("FAKE_LLM_JITTER", 0.1))
+TOKENS_PER_SECOND = float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", 80))
+SEED = os.getenv("FAKE_LLM_SEED", "0")
+REPLAY_PATH = os.getenv("FAKE_LLM_REPLAY")
+RATE_LIMIT_ERRORS = float(os.getenv("FAKE_LLM_RATE_LIMIT_ERRORS", 0))
+
+# characters per streamed chunk, roughly one token
+CHUNK_CHARS = 4
+FILLER_WORDS = (
+    "growth", "margin", "synergy", "market", "integration", "revenue", "brand", "risk",
+    "portfolio", "expansion", "regional", "operations", "customers", "capital", "stable",
+)
+
+_responders: list[tuple[str, object]] = []
+# decides which calls fail; not seeded by the prompt, so a retried call can succeed
+_errors = random.Random(SEED)
+
+
+class FakeRateLimitError(Exception):
+    """Looks like openai.RateLimitError to rate_limiter: status 429 and a retry-after header."""
+
+    status_code = 429
+
+    def __init__(self, retry_after: float = 1.0):
+        super().__init__("Rate limit reached (simulated)")
+        self.response = type("Response", (), {"headers": {"retry-after": str(retry_after)}})()
+
+
+def register_responder(marker: str, respond):
+    """Answer prompts containing `marker` with `respond(prompt) -> str`; later registrations win."""
+    _responders.insert(0, (marker, respond))
+
+
+def _prompt_text(prompt) -> str:
+    if isinstance(prompt, str):
+        return prompt
+    if hasattr(prompt, "to_string"):
+        return prompt.to_string()
+    return "\n".join(getattr(message, "content", str(message)) for message in prompt)
+
+
+def _rng(*parts) -> random.Random:
+    digest = hashlib.sha256("\x00".join(map(str, (SEED, *parts))).encode("utf-8")).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+
+def _loads_lenient(text: str):
+    # prompt examples are not always strict JSON (e.g. `"confidenceScore": 1–10`, trailing commas, or
+    # a note like `"...", <eg. "Central Kitchen", "iberry Trademark">` written outside the quotes)
+    text = re.sub(r",(\s*[}\]])", r"\1", text)
+    for _ in range(50):
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError as error:
+            # the bad value runs from the last separator before the error to the next one after it
+            start = max(text.rfind(char, 0, error.pos) for char in ":,[") + 1
+            end = error.pos
+            while end < len(text) and text[end] not in ",}]\n":
+                end += 1
+            bare = text[start:end].strip()
+            if start and bare and not bare.startswith('"'):
+                text = text[:start] + " " + json.dumps(bare) + text[end:]
+            elif error.msg.startswith("Expecting ',' delimiter"):
+                # a value after whitespace is missing its comma; a stray character right after a value is dropped
+                if text[error.pos - 1].isspace():
+                    text = text[:error.pos] + "," + text[error.pos:]
+                else:
+                    text = text[:error.pos] + text[error.pos + 1:]
+            else:
+                return None
+    return None
+
+
+def _json_blocks(text: str):
+    # (start, parsed) for every balanced top-level {...} / [...] in the text
+    depth, start, in_string, escape = 0, None, False, False
+    for i, char in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif char == "\\":
+                escape = True
+            elif char == '"':
+                in_string = False
+        elif char == '"' and depth:
+            in_string = True
+        elif char in "{[":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif char in "}]" and depth:
+            depth -= 1
+            if depth == 0:
+                parsed = _loads_lenient(text[start:i + 1])
+                if isinstance(parsed, (dict, list)) and parsed:
+                    yield start, parsed
+
+
+def _is_placeholder(value) -> bool:
+    return isinstance(value, str) and (value.startswith("<") or value == "...")
+
+
+def _has_placeholders(data) -> bool:
+    if isinstance(data, dict):
+        return any(_has_placeholders(value) for value in data.values())
+    if isinstance(data, list):
+        return any(_has_placeholders(value) for value in data)
+    return _is_placeholder(data)
+
+
+def find_schema(prompt: str):
+    """The output example of a prompt: a ```json block, else a block with <placeholders>."""
+    fence = prompt.find("```json")
+    blocks = list(_json_blocks(prompt))
+    for start, parsed in blocks:
+        if fence >= 0 and start > fence:
+            return parsed
+    for start, parsed in blocks:
+        if _has_placeholders(parsed):
+            return parsed
+    return None
+
+
+def fill_schema(schema, rng: random.Random):
+    """Same shape as `schema`, with every string replaced by deterministic filler text."""
+    if isinstance(schema, dict):
+        return {key: fill_schema(value, rng) for key, value in schema.items()}
+    if isinstance(schema, list):
+        items = [item for item in schema if item != "..."] or schema[:1]
+        return [fill_schema(item, rng) for item in items]
+    if isinstance(schema, str):
+        words = max(3, min(40, len(schema.split())))
+        return " ".join(rng.choice(FILLER_WORDS) for _ in range(words)).capitalize() + "."
+    return schema
+
+
+def _chart_plan(prompt: str) -> str:
+    # a plan that get_charts_fig can draw: one line chart per subcategory found in the CSV sample
+    sample = prompt.split("Here is a sample of the combined dataset:", 1)[-1].strip()
+    rows = list(csv.DictReader(io.StringIO(sample)))
+    subcategories = list(dict.fromkeys(row["Subcategory"] for row in rows if row.get("Value") not in (None, "", "NaN")))
+    charts = [
+        {"type": "line", "title": f"{name} over time", "x": "Year", "y": "Value", "filter": {"Subcategory": name}}
+        for name in subcategories[:4]
+    ]
+    charts.append({"type": "analysis", "title": "Overall Analysis", "value": "Both companies grew steadily."})
+    return json.dumps(charts)
+
+
+def _html_section(prompt: str) -> str:
+    return "<h2>Section</h2>\n<p>" + fill_schema("<summary of the section content>", _rng(prompt)) + "</p>"
+
+
+register_responder("data visualization expert", _chart_plan)
+register_responder("You are a HTML formatter", _html_section)
+
+
+class FakeChatModel:
+    """Implements the parts of ChatOpenAI the agents use: invoke, ainvoke, stream, astream."""
+
+    def __init__(self, model: str, temperature: float = 0, latency: float = LATENCY, jitter: float = JITTER,
+                 tokens_per_second: float = TOKENS_PER_SECOND, replay_path: str | None = REPLAY_PATH):
+        self.model = model
+        # a separate name keeps fake answers out of the real entries of the response cache
+        self.model_name = f"fake:{model}"
+        self.temperature = temperature
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.replay = LLMCache(replay_path, ttl_seconds=float("inf")) if replay_path else None
+
+    def answer(self, prompt: str) -> str:
+        if self.replay is not None:
+            recorded = self.replay.get(LLMCache.make_key(self.model, self.temperature, prompt))
+            if recorded is not None:
+                return recorded.content
+        for marker, respond in _responders:
+            if marker in prompt:
+                return respond(prompt)
+        rng = _rng(self.model, self.temperature, prompt)
+        schema = find_schema(prompt)
+        if schema is None:
+            schema = {"summary": "<summary>", "keyPoints": ["<point>", "<point>"]}
+        return json.dumps(fill_schema(schema, rng), ensure_ascii=False, indent=2)
+
+    def _delays(self, prompt: str) -> tuple[float, float]:
+        # (seconds before the first token, seconds per streamed chunk of about one token)
+        rng = _rng("delay", self.model, prompt)
+        first = max(0.0, self.latency + rng.uniform(-self.jitter, self.jitter))
+        per_chunk = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        return first, per_chunk
+
+    def _metadata(self, prompt: str, content: str) -> tuple[dict, dict]:
+        prompt_tokens, completion_tokens = count_tokens(prompt, self.model), count_tokens(content, self.model)
+        usage = {"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens}
+        response_metadata = {"model_name": self.model_name, "finish_reason": "stop", "token_usage": {
+            "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }}
+        return usage, response_metadata
+
+    def _respond(self, prompt):
+        if RATE_LIMIT_ERRORS and _errors.random() < RATE_LIMIT_ERRORS:
+            raise FakeRateLimitError()
+        prompt = _prompt_text(prompt)
+        content = self.answer(prompt)
+        first, per_chunk = self._delays(prompt)
+        chunks = [content[i:i + CHUNK_CHARS] for i in range(0, len(content), CHUNK_CHARS)]
+        usage, response_metadata = self._metadata(prompt, content)
+        return content, chunks, first, per_chunk, usage, response_metadata
+
+    def invoke(self, prompt, *args, **kwargs) -> AIMessage:
+        content, chunks, first, per_chunk, usage, response_metadata = self._respond(prompt)
+        time.sleep(first + per_chunk * len(chunks))
+        return AIMessage(content=content, usage_metadata=usage, response_metadata=response_metadata)
+
+    async def ainvoke(self, prompt, *args, **kwargs) -> AIMessage:
+        content, chunks, first, per_chunk, usage, response_metadata = self._respond(prompt)
+        await asyncio.sleep(first + per_chunk * len(chunks))
+        return AIMessage(content=content, usage_metadata=usage, response_metadata=response_metadata)
+
+    def stream(self, prompt, *args, **kwargs):
+        content, chunks, first, per_chunk, usage, response_metadata = self._respond(prompt)
+        # each chunk is due at a fixed offset, so sleep overhead does not add up over long answers
+        started = time.perf_counter()
+        for i, chunk in enumerate(chunks, 1):
+            time.sleep(max(0.0, started + first + per_chunk * i - time.perf_counter()))
+            yield AIMessageChunk(content=chunk)
+        yield AIMessageChunk(content="", usage_metadata=usage, response_metadata=response_metadata)
+
+    async def astream(self, prompt, *args, **kwargs):
+        content, chunks, first, per_chunk, usage, response_metadata = self._respond(prompt)
+        started = time.perf_counter()
+        for i, chunk in enumerate(chunks, 1):
+            # sleep(0) still yields to the other agents on the loop, as a real network read would
+            await asyncio.sleep(max(0.0, started + first + per_chunk * i - time.perf_counter()))
+            yield AIMessageChunk(content=chunk)
+        yield AIMessageChunk(content="", usage_metadata=usage, response_metadata=response_metadata)
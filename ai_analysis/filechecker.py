@@ -1,11 +1,5 @@
-
-mock_database = {
-    "company_income_statement": [
-        "centel",
-        "iberry"
-    ]
-}
+from ai_visualization.catalog import get_catalog
 
 def company_file_exists(company_name: str):
 
-    return company_name.lower() in mock_database["company_income_statement"]
+    return get_catalog().exists(company_name)
@@ -0,0 +1,73 @@
+import re
+from html import escape
+
+# Renders agent JSON into the same semantic HTML the HTMLAgent prompt asks for:
+# one <h1> title, nested objects as <h2>/<h3>/<h4> sections, scalars as paragraphs,
+# arrays of scalars as <ul> lists and arrays of objects as <table>s. No styling.
+
+_CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])|_")
+
+
+def humanize(key: str) -> str:
+    words = _CAMEL_BOUNDARY.sub(" ", str(key)).split()
+    return " ".join(word[:1].upper() + word[1:] for word in words)
+
+
+def _scalar(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, bool):
+        return "Yes" if value else "No"
+    return escape(str(value))
+
+
+def _cell(value) -> str:
+    if isinstance(value, dict):
+        return "; ".join(f"{humanize(k)}: {_cell(v)}" for k, v in value.items())
+    if isinstance(value, list):
+        return ", ".join(_cell(v) for v in value)
+    return _scalar(value)
+
+
+def _list(items: list) -> str:
+    if items and all(isinstance(item, dict) for item in items):
+        columns = []
+        for item in items:
+            columns.extend(key for key in item if key not in columns)
+        head = "".join(f"<th>{escape(humanize(col))}</th>" for col in columns)
+        rows = "".join(
+            "<tr>" + "".join(f"<td>{_cell(item.get(col))}</td>" for col in columns) + "</tr>"
+            for item in items
+        )
+        return f"<table><thead><tr>{head}</tr></thead><tbody>{rows}</tbody></table>"
+    return "<ul>" + "".join(f"<li>{_cell(item)}</li>" for item in items) + "</ul>"
+
+
+def _section(data: dict, level: int) -> str:
+    heading = f"h{min(level, 4)}"
+    parts = []
+    for key, value in data.items():
+        label = escape(humanize(key))
+        if isinstance(value, dict):
+            parts.append(f"<{heading}>{label}</{heading}>")
+            parts.append(_section(value, level + 1))
+        elif isinstance(value, list):
+            parts.append(f"<{heading}>{label}</{heading}>")
+            parts.append(_list(value))
+        else:
+            parts.append(f"<p><strong>{label}:</strong> {_scalar(value)}</p>")
+    return "".join(parts)
+
+
+def render_json_html(data, title: str | None = None) -> str:
+    """Render parsed agent JSON as an HTML fragment (no <html>/<body>)."""
+    # a single top-level key (e.g. {"buyer": {...}}) becomes the document title
+    if isinstance(data, dict) and len(data) == 1 and isinstance(next(iter(data.values())), dict):
+        key, data = next(iter(data.items()))
+        title = title or humanize(key)
+    html = f"<h1>{escape(title or 'Report')}</h1>"
+    if isinstance(data, dict):
+        return html + _section(data, 2)
+    if isinstance(data, list):
+        return html + _list(data)
+    return html + f"<p>{_scalar(data)}</p>"
@@ -0,0 +1,231 @@
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from pathlib import Path
+
+import pandas as pd
+
+from . import rate_limiter, telemetry
+from .pipeline import analysis_outputs, build_analysis_graph, run_input_hash
+from .run_store import RunStore, get_run_store
+from .shared import SqliteStore, process_singleton
+
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", ".cache/jobs.sqlite")
+JOB_STORE_TTL_SECONDS = float(os.getenv("JOB_STORE_TTL_SECONDS", 7 * 24 * 3600))
+# pipeline runs executed at the same time; each one still runs its agents concurrently
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+
+FINISHED = ("complete", "failed")
+
+
+class TokenBuffer:
+    # collects streamed text per agent from worker threads; read back by whoever polls the job
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._chunks: dict[str, list[str]] = {}
+
+    def append(self, key, text):
+        # chunks are joined only when read; concatenating on every token is quadratic in the answer length
+        with self._lock:
+            self._chunks.setdefault(key, []).append(text)
+
+    def reset(self, key):
+        # the agent's answer was rejected and streams again from the start
+        with self._lock:
+            self._chunks[key] = []
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            text = {key: "".join(chunks) for key, chunks in self._chunks.items()}
+            # the next poll starts from the joined text instead of joining the same chunks again
+            for key, joined in text.items():
+                self._chunks[key] = [joined]
+            return text
+
+
+class JobStore(SqliteStore):
+    """Status, progress events and outputs of background jobs, so any session (or a reloaded page) can follow one."""
+
+    def __init__(self, path: str | Path = JOB_STORE_PATH, ttl_seconds: float = JOB_STORE_TTL_SECONDS):
+        super().__init__(path, """
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                session_id TEXT,
+                inputs TEXT,
+                status TEXT,
+                run_id TEXT,
+                error TEXT,
+                outputs TEXT,
+                created_at REAL,
+                started_at REAL,
+                finished_at REAL,
+                updated_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS job_events (
+                job_id TEXT,
+                seq INTEGER,
+                node TEXT,
+                state TEXT,
+                detail TEXT,
+                at REAL,
+                PRIMARY KEY (job_id, seq)
+            );
+        """)
+        self.ttl_seconds = ttl_seconds
+
+    def create(self, session_id: str, inputs: dict) -> str:
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._transaction() as conn:
+            self._delete_older("jobs", now - self.ttl_seconds, key="job_id", children=("job_events",))
+            conn.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, 'queued', NULL, NULL, NULL, ?, NULL, NULL, ?)",
+                (job_id, session_id, json.dumps(inputs), now, now),
+            )
+        return job_id
+
+    def update(self, job_id: str, **fields) -> None:
+        fields["updated_at"] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._transaction() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def add_event(self, job_id: str, node: str, state: str, detail: str = "") -> None:
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO job_events SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ?, ?, ? FROM job_events WHERE job_id = ?",
+                (job_id, node, state, detail, time.time(), job_id),
+            )
+
+    def events(self, job_id: str) -> list[tuple[str, str, str]]:
+        """(node, state, detail) in the order they happened."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT node, state, detail FROM job_events WHERE job_id = ? ORDER BY seq", (job_id,)
+            ).fetchall()
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT session_id, inputs, status, run_id, error, outputs, created_at, started_at, finished_at "
+                "FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("session_id", "inputs", "status", "run_id", "error", "outputs", "created_at", "started_at",
+                "finished_at")
+        job = {"job_id": job_id, **dict(zip(keys, row))}
+        job["inputs"] = json.loads(job["inputs"])
+        return job
+
+    def unfinished(self) -> list[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id FROM jobs WHERE status NOT IN ('complete', 'failed') ORDER BY created_at"
+            ).fetchall()
+        return [job_id for (job_id,) in rows]
+
+
+def dump_outputs(outputs: dict) -> str:
+    # analysis_outputs() as JSON; the chart data frame goes along so charts can be redrawn after a reload
+    return json.dumps({**outputs, "df": outputs["df"].to_json(orient="split", date_format="iso")})
+
+
+def load_outputs(text: str) -> dict:
+    outputs = json.loads(text)
+    outputs["df"] = pd.read_json(StringIO(outputs["df"]), orient="split")
+    return outputs
+
+
+class JobQueue:
+    """Runs analysis pipelines on worker threads, recording progress in a JobStore and checkpoints in a RunStore."""
+
+    def __init__(self, agents: dict, store: JobStore, run_store: RunStore, workers: int = JOB_WORKERS):
+        self.agents = agents
+        self.store = store
+        self.run_store = run_store
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="job")
+        self._lock = threading.Lock()
+        # streamed tokens are only kept in memory; progress events and outputs go to the store
+        self._tokens: dict[str, TokenBuffer] = {}
+
+    def submit(self, inputs: dict, session_id: str = "default", prefetched: dict | None = None) -> str:
+        """Queue a pipeline run for `inputs` (co1, co1_info, co2, co2_info); `prefetched` as in build_analysis_graph."""
+        job_id = self.store.create(session_id, inputs)
+        self._enqueue(job_id, prefetched)
+        return job_id
+
+    def _enqueue(self, job_id: str, prefetched: dict | None = None):
+        with self._lock:
+            self._tokens[job_id] = TokenBuffer()
+        self._pool.submit(self._run, job_id, prefetched)
+
+    def recover(self) -> list[str]:
+        """Queue again the jobs a previous process left unfinished; returns their IDs."""
+        job_ids = self.store.unfinished()
+        for job_id in job_ids:
+            self.store.add_event(job_id, "job", "requeued")
+            self._enqueue(job_id)
+        return job_ids
+
+    def live_tokens(self, job_id: str) -> dict:
+        with self._lock:
+            buffer = self._tokens.get(job_id)
+        return buffer.snapshot() if buffer is not None else {}
+
+    def _run(self, job_id: str, prefetched: dict | None):
+        try:
+            self._execute(job_id, prefetched)
+        except Exception as error:
+            self.store.update(job_id, status="failed", error=str(error), finished_at=time.time())
+        else:
+            self.store.update(job_id, status="complete", finished_at=time.time())
+        finally:
+            with self._lock:
+                self._tokens.pop(job_id, None)
+
+    def _execute(self, job_id: str, prefetched: dict | None):
+        job = self.store.get(job_id)
+        inputs, session_id = job["inputs"], job["session_id"]
+        co1, co1_info, co2, co2_info = (inputs[key] for key in ("co1", "co1_info", "co2", "co2_info"))
+        # a job for inputs that failed before continues from that run's completed stages
+        run_id, restored = self.run_store.start(run_input_hash(co1, co1_info, co2, co2_info), inputs)
+        self.store.update(job_id, status="running", run_id=run_id, started_at=time.time())
+        with self._lock:
+            buffer = self._tokens.setdefault(job_id, TokenBuffer())
+        prefetched = {key: future for key, future in (prefetched or {}).items() if key not in restored}
+        graph = build_analysis_graph(self.agents, co1, co1_info, co2, co2_info, on_token=buffer.append,
+                                     on_retry=buffer.reset, prefetched=prefetched)
+        restored = {node: value for node, value in restored.items() if node in graph.nodes}
+        for node in restored:
+            self.store.add_event(job_id, node, "restored")
+
+        def on_status(node, state, value):
+            if state == "complete" and isinstance(value, str):
+                self.run_store.save_stage(run_id, node, value)
+            detail = value[0] if state == "partial" else str(value) if state == "error" else ""
+            self.store.add_event(job_id, node, state, detail)
+
+        # the trace is named after the job, so the page can read its telemetry back after a reload
+        run = telemetry.RunTelemetry(run_id=job_id)
+        try:
+            # the lease keeps a concurrent job with the same inputs from resuming this run
+            with self.run_store.lease(run_id), telemetry.activate(run), rate_limiter.session(session_id):
+                outputs = analysis_outputs(graph.run(results=restored, on_status=on_status))
+        except Exception as error:
+            self.run_store.finish(run_id, error)
+            raise
+        self.run_store.finish(run_id)
+        self.store.update(job_id, outputs=dump_outputs(outputs))
+
+
+@process_singleton
+def get_job_queue(agents: dict) -> JobQueue:
+    # the first caller's agents run every job
+    queue = JobQueue(agents, JobStore(), get_run_store())
+    queue.recover()
+    return queue
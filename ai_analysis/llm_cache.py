@@ -0,0 +1,249 @@
+import hashlib
+import json
+import os
+import time
+
+from langchain_core.messages import AIMessage
+
+from . import rate_limiter
+from .shared import SqliteStore, process_singleton
+from .singleflight import get_single_flight
+
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite")
+CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+CACHE_MAX_BYTES = int(float(os.getenv("LLM_CACHE_MAX_MB", 200)) * 1024 * 1024)
+
+
+class LLMCache(SqliteStore):
+    """On-disk LLM responses keyed by model, temperature and prompt hash, expired by age and evicted LRU by size."""
+
+    def __init__(self, path: str = CACHE_PATH, ttl_seconds: float = CACHE_TTL_SECONDS, max_bytes: int = CACHE_MAX_BYTES):
+        super().__init__(path, """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                content TEXT,
+                metadata TEXT,
+                size INTEGER,
+                created_at REAL,
+                accessed_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at);
+        """)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(model: str, temperature, prompt: str) -> str:
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return hashlib.sha256(f"{model}\x00{temperature}\x00{prompt_hash}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> AIMessage | None:
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT content, metadata, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            content, metadata, created_at = row
+            if now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        return AIMessage(content=content, response_metadata=json.loads(metadata))
+
+    def set(self, key: str, model: str, response) -> None:
+        content = response.content
+        metadata = json.dumps(response.response_metadata, default=str)
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, content, metadata, len(content) + len(metadata), now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        self._delete_older("responses", now - self.ttl_seconds, column="created_at")
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def delete(self, key: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM responses")
+
+
+@process_singleton
+def get_cache() -> LLMCache:
+    return LLMCache()
+
+
+def _llm_key(llm, prompt: str):
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", "")
+    return model, LLMCache.make_key(model, getattr(llm, "temperature", None), prompt)
+
+
+def _flight_key(agent: str, key: str) -> str:
+    # identical prompts from the same agent with the same model parameters share one call
+    return f"{agent}\x00{key}"
+
+
+def _lookup(cache: LLMCache, key: str, valid):
+    # an answer the caller would reject is never served, even if an older version cached it
+    cached = cache.get(key)
+    if cached is not None and valid is not None and not valid(cached.content):
+        cache.delete(key)
+        return None
+    return cached
+
+
+def _store(cache: LLMCache, key: str, model: str, response, valid):
+    # a rejected answer must not come back as a hit and be rejected (and escalated) again on every run
+    if valid is None or valid(response.content):
+        cache.set(key, model, response)
+
+
+def cached_invoke(llm, prompt: str, use_cache: bool = True, agent: str = "", valid=None):
+    """Call `llm.invoke(prompt)` through the response cache; misses go through the rate limiter.
+
+    Concurrent misses for the same agent, model parameters and prompt make one
+    call and all get its response (see singleflight). Returns (response, status)
+    where status is "hit", "miss", "shared" (another caller's in-flight call) or
+    "bypass"; bypassed calls are never shared. With `valid(content)`, only
+    answers it accepts are cached.
+    """
+    if not use_cache:
+        return rate_limiter.invoke(llm, prompt), "bypass"
+    cache = get_cache()
+    model, key = _llm_key(llm, prompt)
+    cached = _lookup(cache, key, valid)
+    if cached is not None:
+        return cached, "hit"
+
+    def call(publish):
+        # a call that finished between the lookup above and this one has already filled the cache
+        response = _lookup(cache, key, valid)
+        if response is not None:
+            publish(response.content)
+            return response, "hit"
+        response = rate_limiter.invoke(llm, prompt)
+        _store(cache, key, model, response, valid)
+        publish(response.content)
+        return response, "miss"
+
+    (response, status), shared = get_single_flight().do(_flight_key(agent, key), call)
+    return response, "shared" if shared else status
+
+
+async def cached_ainvoke(llm, prompt: str, use_cache: bool = True, agent: str = "", valid=None):
+    if not use_cache:
+        return await rate_limiter.ainvoke(llm, prompt), "bypass"
+    cache = get_cache()
+    model, key = _llm_key(llm, prompt)
+    cached = _lookup(cache, key, valid)
+    if cached is not None:
+        return cached, "hit"
+
+    async def call(publish):
+        response = _lookup(cache, key, valid)
+        if response is not None:
+            publish(response.content)
+            return response, "hit"
+        response = await rate_limiter.ainvoke(llm, prompt)
+        _store(cache, key, model, response, valid)
+        publish(response.content)
+        return response, "miss"
+
+    (response, status), shared = await get_single_flight().ado(_flight_key(agent, key), call)
+    return response, "shared" if shared else status
+
+
+def _join_chunks(chunks):
+    response = chunks[0]
+    for chunk in chunks[1:]:
+        response = response + chunk
+    return AIMessage(
+        content=response.content,
+        response_metadata=response.response_metadata,
+        usage_metadata=response.usage_metadata,
+    )
+
+
+def cached_stream(llm, prompt: str, on_token, use_cache: bool = True, agent: str = "", valid=None):
+    """Like cached_invoke, but streams the response and calls `on_token(text)` per chunk.
+
+    A cache hit is delivered to `on_token` as a single chunk. A caller sharing an
+    in-flight call gets the chunks streamed so far, then the rest as they arrive.
+    """
+    if not use_cache:
+        chunks = []
+        for chunk in rate_limiter.stream(llm, prompt, stream_usage=True):
+            chunks.append(chunk)
+            if chunk.content:
+                on_token(chunk.content)
+        return _join_chunks(chunks), "bypass"
+    cache = get_cache()
+    model, key = _llm_key(llm, prompt)
+    cached = _lookup(cache, key, valid)
+    if cached is not None:
+        on_token(cached.content)
+        return cached, "hit"
+
+    def call(publish):
+        response = _lookup(cache, key, valid)
+        if response is not None:
+            publish(response.content)
+            return response, "hit"
+        chunks = []
+        for chunk in rate_limiter.stream(llm, prompt, stream_usage=True):
+            chunks.append(chunk)
+            if chunk.content:
+                publish(chunk.content)
+        response = _join_chunks(chunks)
+        _store(cache, key, model, response, valid)
+        return response, "miss"
+
+    (response, status), shared = get_single_flight().do(_flight_key(agent, key), call, on_token)
+    return response, "shared" if shared else status
+
+
+async def cached_astream(llm, prompt: str, on_token, use_cache: bool = True, agent: str = "", valid=None):
+    if not use_cache:
+        chunks = []
+        async for chunk in rate_limiter.astream(llm, prompt, stream_usage=True):
+            chunks.append(chunk)
+            if chunk.content:
+                on_token(chunk.content)
+        return _join_chunks(chunks), "bypass"
+    cache = get_cache()
+    model, key = _llm_key(llm, prompt)
+    cached = _lookup(cache, key, valid)
+    if cached is not None:
+        on_token(cached.content)
+        return cached, "hit"
+
+    async def call(publish):
+        response = _lookup(cache, key, valid)
+        if response is not None:
+            publish(response.content)
+            return response, "hit"
+        chunks = []
+        async for chunk in rate_limiter.astream(llm, prompt, stream_usage=True):
+            chunks.append(chunk)
+            if chunk.content:
+                publish(chunk.content)
+        response = _join_chunks(chunks)
+        _store(cache, key, model, response, valid)
+        return response, "miss"
+
+    (response, status), shared = await get_single_flight().ado(_flight_key(agent, key), call, on_token)
+    return response, "shared" if shared else status
@@ -0,0 +1,88 @@
+import os
+import threading
+
+import httpx
+from langchain_openai import ChatOpenAI
+
+from .fake_llm import FakeChatModel
+
+# Connection pool settings for the HTTP clients shared by every ChatOpenAI instance
+POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", 20))
+POOL_MAX_KEEPALIVE = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", 10))
+POOL_KEEPALIVE_EXPIRY = float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", 60))
+REQUEST_TIMEOUT = float(os.getenv("LLM_REQUEST_TIMEOUT", 120))
+# "openai" or "fake" (ai_analysis.fake_llm: offline answers with simulated latency, for benchmarks)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+
+_lock = threading.Lock()
+_http_clients: dict[str, tuple[httpx.Client, httpx.AsyncClient]] = {}
+_llms: dict[tuple, ChatOpenAI] = {}
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=POOL_MAX_KEEPALIVE,
+        keepalive_expiry=POOL_KEEPALIVE_EXPIRY,
+    )
+
+
+def get_http_clients(model: str) -> tuple[httpx.Client, httpx.AsyncClient]:
+    """Sync and async HTTP clients for `model`, created once per process.
+
+    The async client is only ever used from the shared loop in async_bridge, so its
+    keep-alive connections stay valid between calls.
+    """
+    with _lock:
+        if model not in _http_clients:
+            _http_clients[model] = (
+                httpx.Client(limits=_limits(), timeout=REQUEST_TIMEOUT),
+                httpx.AsyncClient(limits=_limits(), timeout=REQUEST_TIMEOUT),
+            )
+        return _http_clients[model]
+
+
+def get_llm(model: str, temperature: float, api_key: str | None) -> ChatOpenAI:
+    """Process-wide ChatOpenAI for one model configuration, reused across sessions and reruns."""
+    key = (model, temperature, api_key)
+    with _lock:
+        llm = _llms.get(key)
+    if llm is not None:
+        return llm
+    if LLM_BACKEND == "fake":
+        with _lock:
+            return _llms.setdefault(key, FakeChatModel(model, temperature))
+    http_client, http_async_client = get_http_clients(model)
+    llm = ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        openai_api_key=api_key,
+        http_client=http_client,
+        http_async_client=http_async_client,
+        # retries are left to rate_limiter, which backs off for every session at once
+        max_retries=0,
+    )
+    with _lock:
+        return _llms.setdefault(key, llm)
+
+
+def swap_model(llm, model: str):
+    """The pooled LLM configured like `llm` (temperature, API key), but for `model`."""
+    with _lock:
+        key = next((key for key, pooled in _llms.items() if pooled is llm), None)
+    if key is None:
+        raise ValueError("swap_model only works with LLMs created by get_llm")
+    if key[0] == model:
+        return llm
+    return get_llm(model, key[1], key[2])
+
+
+def pool_settings() -> dict:
+    return {
+        "max_connections": POOL_MAX_CONNECTIONS,
+        "max_keepalive_connections": POOL_MAX_KEEPALIVE,
+        "keepalive_expiry": POOL_KEEPALIVE_EXPIRY,
+        "timeout": REQUEST_TIMEOUT,
+        "backend": LLM_BACKEND,
+        "clients": sorted(_http_clients),
+    }
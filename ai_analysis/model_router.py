@@ -0,0 +1,212 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from . import telemetry
+from .llm_pool import swap_model
+from .shared import process_singleton
+
+# Models the router may pick from, cheapest and smallest first: a failed answer is retried
+# with the next model up. `tier` is the quality class (higher is stronger) and `latency_s`
+# a typical call duration, used until there are measurements. LLM_MODEL_CATALOGUE takes
+# the same list as JSON.
+DEFAULT_CATALOGUE = [
+    {"model": "gpt-4o-mini", "tier": 1, "latency_s": 8.0},
+    {"model": "gpt-4o-2024-08-06", "tier": 2, "latency_s": 20.0},
+    {"model": "gpt-4o-2024-05-13", "tier": 2, "latency_s": 25.0},
+]
+# "off" keeps every agent on the model it was built with
+ROUTING = os.getenv("LLM_ROUTING", "on") != "off"
+# the latency percentile compared with an agent's budget
+LATENCY_PERCENTILE = float(os.getenv("LLM_ROUTING_PERCENTILE", 90))
+# measurements needed before they replace the catalogue latency or count against a model
+MIN_SAMPLES = int(os.getenv("LLM_ROUTING_MIN_SAMPLES", 5))
+# a model whose answers for an agent fail validation more often than this is skipped for it
+MAX_INVALID_RATE = float(os.getenv("LLM_ROUTING_MAX_INVALID_RATE", 0.2))
+WINDOW = 200
+# recent telemetry traces read at startup, so routing starts from measured latencies
+TRACE_FILES = 200
+
+
+def configured_latency_budget(agent_name: str, default: float | None) -> float | None:
+    # e.g. LATENCY_BUDGET_STRATEGYAGENT=60 overrides StrategyAgent's budget; 0 removes it
+    value = os.getenv(f"LATENCY_BUDGET_{agent_name.upper()}")
+    if value is None:
+        return default
+    return float(value) or None
+
+
+def load_catalogue() -> list[dict]:
+    configured = os.getenv("LLM_MODEL_CATALOGUE")
+    return json.loads(configured) if configured else DEFAULT_CATALOGUE
+
+
+def _percentile(values, percentile: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percentile / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class ModelRouter:
+    """Picks the model for each agent call from a catalogue by quality tier, latency budget and measured latencies."""
+
+    def __init__(self, catalogue: list[dict] | None = None, percentile: float = LATENCY_PERCENTILE,
+                 trace_dir: Path | None = telemetry.TRACE_DIR):
+        self.catalogue = catalogue if catalogue is not None else load_catalogue()
+        self.percentile = percentile
+        self._lock = threading.Lock()
+        self._latency: dict[tuple[str, str | None], deque] = {}
+        self._valid: dict[tuple[str, str], deque] = {}
+        if trace_dir is not None:
+            self._load_traces(Path(trace_dir))
+
+    def _load_traces(self, trace_dir: Path):
+        known = {entry["model"] for entry in self.catalogue}
+        traces = sorted(trace_dir.glob("*.jsonl"), key=lambda path: path.stat().st_mtime)[-TRACE_FILES:]
+        for path in traces:
+            try:
+                lines = path.read_text(encoding="utf-8").splitlines()
+            except OSError:
+                continue
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                # only calls that reached the provider say anything about its latency
+                if record.get("model") in known and record.get("cache") == "miss" and record.get("status") == "ok":
+                    self.observe(record["model"], record["agent"], record["wall_time_s"])
+
+    def observe(self, model: str, agent: str, seconds: float):
+        with self._lock:
+            for key in ((model, agent), (model, None)):
+                self._latency.setdefault(key, deque(maxlen=WINDOW)).append(seconds)
+
+    def observe_validation(self, model: str, agent: str, valid: bool):
+        with self._lock:
+            self._valid.setdefault((model, agent), deque(maxlen=WINDOW)).append(valid)
+
+    def latency(self, model: str, agent: str) -> float:
+        # measured for this agent, else across agents, else the catalogue figure
+        with self._lock:
+            for key in ((model, agent), (model, None)):
+                samples = self._latency.get(key)
+                if samples and len(samples) >= MIN_SAMPLES:
+                    return _percentile(samples, self.percentile)
+        return next(entry["latency_s"] for entry in self.catalogue if entry["model"] == model)
+
+    def _reliable(self, model: str, agent: str) -> bool:
+        with self._lock:
+            outcomes = self._valid.get((model, agent))
+            if not outcomes or len(outcomes) < MIN_SAMPLES:
+                return True
+            return outcomes.count(False) / len(outcomes) <= MAX_INVALID_RATE
+
+    def candidates(self, tier: int) -> list[str]:
+        return [entry["model"] for entry in self.catalogue if entry["tier"] >= tier]
+
+    def choose(self, agent: str, tier: int, budget: float | None) -> str:
+        """The first model of at least `tier` within `budget`, else the fastest; unreliable models are skipped."""
+        candidates = self.candidates(tier)
+        if not candidates:
+            raise ValueError(f"no model of tier {tier} or above in the catalogue")
+        reliable = [model for model in candidates if self._reliable(model, agent)] or candidates[-1:]
+        if budget is None:
+            return reliable[0]
+        for model in reliable:
+            if self.latency(model, agent) <= budget:
+                return model
+        return min(reliable, key=lambda model: self.latency(model, agent))
+
+    def fallback(self, model: str, tier: int) -> str | None:
+        """The next larger catalogue model after `model`, or None if it was the largest."""
+        candidates = self.candidates(tier)
+        if model not in candidates:
+            return candidates[0] if candidates else None
+        position = candidates.index(model)
+        return candidates[position + 1] if position + 1 < len(candidates) else None
+
+    def _route(self, agent: str, llm, tier: int, budget: float | None):
+        if not ROUTING:
+            return None, llm
+        model = self.choose(agent, tier, budget)
+        return model, swap_model(llm, model)
+
+    def _judge(self, agent: str, model: str | None, llm, tier: int, response, cache_status: str, started: float,
+               valid):
+        """Record the attempt; returns the model to retry with, or None to keep `response`."""
+        if model is None:
+            return None
+        # cached and shared answers were not timed against the provider
+        if cache_status == "miss":
+            self.observe(model, agent, time.perf_counter() - started)
+        ok = valid(response.content)
+        if cache_status == "miss":
+            self.observe_validation(model, agent, ok)
+        if ok:
+            return None
+        retry = self.fallback(model, tier)
+        if retry is not None:
+            telemetry.record_call(agent, llm.model_name, started, response=response, cache=cache_status, rejected=True)
+        return retry
+
+    def _final(self, model: str | None, tier: int) -> bool:
+        # an answer from this model is kept whether or not it validates
+        return model is None or self.fallback(model, tier) is None
+
+    def call(self, agent: str, llm, tier: int, budget: float | None, invoke, valid, on_attempt=None):
+        """`invoke(llm) -> (response, cache_status)` on the routed model; returns (response, cache_status, llm).
+
+        `llm` is the agent's own model, used as is when routing is off; `valid(content)`
+        decides whether an answer is kept or retried one model up. `on_attempt(final)`
+        is called before every attempt; `final` is False while the answer may still be rejected.
+        """
+        model, routed = self._route(agent, llm, tier, budget)
+        while True:
+            if on_attempt is not None:
+                on_attempt(self._final(model, tier))
+            started = time.perf_counter()
+            response, cache_status = invoke(routed)
+            model = self._judge(agent, model, routed, tier, response, cache_status, started, valid)
+            if model is None:
+                return response, cache_status, routed
+            routed = swap_model(llm, model)
+
+    async def acall(self, agent: str, llm, tier: int, budget: float | None, ainvoke, valid, on_attempt=None):
+        model, routed = self._route(agent, llm, tier, budget)
+        while True:
+            if on_attempt is not None:
+                on_attempt(self._final(model, tier))
+            started = time.perf_counter()
+            response, cache_status = await ainvoke(routed)
+            model = self._judge(agent, model, routed, tier, response, cache_status, started, valid)
+            if model is None:
+                return response, cache_status, routed
+            routed = swap_model(llm, model)
+
+    def snapshot(self) -> dict:
+        """Per model: latency percentile across agents, samples, and the share of answers that validated."""
+        with self._lock:
+            latency = {model: list(samples) for (model, agent), samples in self._latency.items() if agent is None}
+            valid = {}
+            for (model, agent), outcomes in self._valid.items():
+                valid.setdefault(model, []).extend(outcomes)
+        return {
+            entry["model"]: {
+                "tier": entry["tier"],
+                f"p{self.percentile:g}_s": round(_percentile(latency[entry["model"]], self.percentile), 2)
+                if entry["model"] in latency else None,
+                "samples": len(latency.get(entry["model"], ())),
+                "valid_rate": round(sum(valid[entry["model"]]) / len(valid[entry["model"]]), 2)
+                if valid.get(entry["model"]) else None,
+            }
+            for entry in self.catalogue
+        }
+
+
+@process_singleton
+def get_router() -> ModelRouter:
+    return ModelRouter()
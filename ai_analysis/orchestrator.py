@@ -0,0 +1,146 @@
+import contextvars
+import inspect
+import json
+import queue
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from . import async_bridge
+
+
+class GraphNode:
+    def __init__(self, name: str, fn, inputs=(), label: str | None = None, streams: bool = False):
+        self.name = name
+        self.fn = fn
+        self.inputs = tuple(inputs)
+        self.label = label or name
+        self.streams = streams
+
+
+def _source(dep: str) -> str:
+    # "strategy.valuationGuidance" is a field of node "strategy"
+    return dep.split(".", 1)[0]
+
+
+class AgentGraph:
+    """Runs a set of nodes as a DAG, starting every node as soon as its inputs are ready."""
+
+    def __init__(self):
+        self.nodes: dict[str, GraphNode] = {}
+
+    def add(self, name: str, fn, inputs=(), label: str | None = None, streams: bool = False):
+        """Add node `name`, whose output `fn` computes from the outputs of `inputs` (node names).
+
+        Coroutine functions run on the shared event loop (see async_bridge), others
+        on worker threads. With `streams`, `fn(inputs, publish)` may call
+        `publish(field, value)` before it returns, and nodes depending on
+        "name.field" start then; unpublished fields are read from its final output.
+        """
+        if name in self.nodes or "." in name:
+            raise ValueError(f"Invalid or duplicate node: {name}")
+        self.nodes[name] = GraphNode(name, fn, inputs, label, streams)
+        return self
+
+    def _check(self):
+        for node in self.nodes.values():
+            for dep in node.inputs:
+                if _source(dep) not in self.nodes:
+                    raise ValueError(f"Node '{node.name}' depends on unknown node '{dep}'")
+        # Kahn's algorithm, only to reject cycles before anything is submitted
+        remaining = {name: {_source(dep) for dep in node.inputs} for name, node in self.nodes.items()}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Cycle between nodes: {sorted(remaining)}")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+
+    def _fill_fields(self, name: str, output, results: dict):
+        wanted = {dep for node in self.nodes.values() for dep in node.inputs if _source(dep) == name and dep != name}
+        if not wanted - results.keys():
+            return
+        if isinstance(output, str):
+            try:
+                output = json.loads(output)
+            except ValueError:
+                output = {}
+        for dep in wanted - results.keys():
+            results[dep] = output.get(dep.split(".", 1)[1]) if isinstance(output, dict) else None
+
+    def run(self, max_workers: int | None = None, on_status=None, results: dict | None = None,
+            on_poll=None, poll_interval: float = 0.2) -> dict:
+        """Execute the graph and return {node name: output}.
+
+        `results` may carry outputs that are already known; those nodes are not run.
+        Callbacks run on the calling thread, so they may touch Streamlit elements.
+        `on_status(name, state, value)` receives "running", "partial" (value is a
+        (field, value) pair from a streaming node), "complete" (value is the output)
+        or "error" (value is the exception). The first failure cancels every node
+        that has not started yet and is re-raised.
+        `on_poll()` is called on the same thread every `poll_interval` seconds while
+        nodes are running, e.g. to flush streamed tokens into the page.
+        """
+        self._check()
+        results = dict(results or {})
+        notify = on_status or (lambda name, state, value: None)
+        pending = {name: node for name, node in self.nodes.items() if name not in results}
+        for name in self.nodes:
+            if name in results:
+                self._fill_fields(name, results[name], results)
+        workers = max_workers or max(1, len(pending))
+        published = queue.Queue()
+        streaming = any(node.streams for node in pending.values())
+
+        def call(node, kwargs):
+            if not node.streams:
+                return node.fn(kwargs)
+            return node.fn(kwargs, lambda field, value: published.put((node.name, field, value)))
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="agent") as pool:
+            running = {}
+
+            def submit_ready():
+                for name, node in list(pending.items()):
+                    if all(dep in results for dep in node.inputs):
+                        del pending[name]
+                        kwargs = {dep: results[dep] for dep in node.inputs}
+                        if inspect.iscoroutinefunction(node.fn):
+                            # async nodes share the process event loop instead of a worker thread
+                            future = async_bridge.submit(call(node, kwargs))
+                        else:
+                            # carry context variables (e.g. the active telemetry run) into the worker
+                            future = pool.submit(contextvars.copy_context().run, call, node, kwargs)
+                        running[future] = name
+                        notify(name, "running", None)
+
+            def drain_published():
+                while True:
+                    try:
+                        name, field, value = published.get_nowait()
+                    except queue.Empty:
+                        return
+                    results.setdefault(f"{name}.{field}", value)
+                    notify(name, "partial", (field, value))
+
+            submit_ready()
+            while running:
+                timeout = poll_interval if (on_poll or streaming) else None
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                if on_poll:
+                    on_poll()
+                drain_published()
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as error:
+                        for other in running:
+                            other.cancel()
+                        notify(name, "error", error)
+                        raise
+                    self._fill_fields(name, results[name], results)
+                    notify(name, "complete", results[name])
+                submit_ready()
+
+        return results
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import re
+import time
+
+import pandas as pd
+
+from . import generate_report, telemetry
+from .artifacts import fingerprint
+from .filechecker import company_file_exists
+from .orchestrator import AgentGraph
+from .stream_json import StreamingJSONParser
+from .token_budget import minify
+from ai_visualization.chart_generator import get_charts_analysis, get_charts_fig, read_charts
+from ai_visualization.data_loader import load_companies, load_key_metrics
+from ai_visualization.llm_agent import analyze_companies
+
+# the parts of the strategy answer the valuation prompt needs; valuation starts as soon as these are streamed
+VALUATION_STRATEGY_FIELDS = ("strategicSummary", "valuationGuidance")
+
+# graph node -> report section, in report order
+SECTION_NODES = {
+    "co1": "company_info_buyer",
+    "co2": "company_info_target",
+    "strategy": "strategy",
+    "valuation": "valuation",
+    "due_diligence": "due_diligence",
+}
+
+
+def clean_json_output(llm_output: str):
+    cleaned = re.sub(r"^```(?:json)?|```$", "", llm_output.strip(), flags=re.MULTILINE)
+    return cleaned.strip()
+
+
+def build_analysis_graph(agents: dict, co1: str, co1_info: str, co2: str, co2_info: str,
+                         on_token=None, prefetched: dict | None = None, on_retry=None) -> AgentGraph:
+    """The M&A comparison as an AgentGraph over the agents of build_agent_registry.
+
+    `on_token(agent_key, text)` receives streamed tokens from every agent;
+    `on_retry(agent_key)` means that agent's answer so far was rejected and it
+    streams again from the start (see ModelRouter.call). Node
+    functions never touch Streamlit, so the graph runs the same in the page and
+    in the batch CLI. `prefetched` maps agent keys to runs already started for
+    this input (see prefetch.Prefetcher); those are awaited instead of run again.
+    """
+    async def run_agent(key, json_input, publish=None):
+        # With `publish`, top-level JSON fields are handed to the graph as soon as they close,
+        # but only from an answer that cannot be rejected any more: downstream nodes may start
+        # on them. Fields of an answer that may still be retried come from the node's output.
+        parser, final, attempts = StreamingJSONParser(max_depth=1), True, 0
+
+        def handle_attempt(is_final):
+            nonlocal parser, final, attempts
+            if attempts and on_retry is not None:
+                on_retry(key)
+            parser, final, attempts = StreamingJSONParser(max_depth=1), is_final, attempts + 1
+
+        def handle_token(text):
+            if on_token is not None:
+                on_token(key, text)
+            if publish is not None and final:
+                for path, value in parser.feed(text):
+                    publish(path[0], value)
+
+        answer = await agents[key].arun(json_input, on_token=handle_token, on_attempt=handle_attempt)
+        return clean_json_output(answer.content)
+
+    async def run_profile(key, json_input):
+        future = (prefetched or {}).get(key)
+        if future is not None:
+            started = time.perf_counter()
+            try:
+                answer = await asyncio.wrap_future(future)
+            except Exception:
+                answer = None  # a failed speculative run is simply run again
+            if answer is not None:
+                telemetry.record_call(agents[key].name, agents[key].llm.model_name, started, cache="prefetch")
+                if on_token is not None:
+                    on_token(key, answer.content)
+                return clean_json_output(answer.content)
+        return await run_agent(key, json_input)
+
+    async def run_buyer_info(values):
+        return await run_profile("company_info_buyer", profile_input(co1, co1_info))
+
+    async def run_target_info(values):
+        return await run_profile("company_info_target", profile_input(co2, co2_info))
+
+    def build_company_data(values):
+        input_data = {
+            "buyer": json.loads(values["company_info_buyer"]),
+            "target": json.loads(values["company_info_target"])
+        }
+        # reported growth and margins, computed locally, for the companies we hold statements of
+        financials = {name: load_key_metrics(name) for name in (co1, co2) if company_file_exists(name)}
+        if financials:
+            input_data["financials"] = financials
+        return minify(input_data)
+
+    async def run_strategy(values, publish):
+        return await run_agent("strategy", values["company_data"], publish)
+
+    async def run_valuation(values):
+        # starts once the strategy fields it needs are streamed, not when the whole answer is done
+        strategy = {field: values[f"strategy.{field}"] for field in VALUATION_STRATEGY_FIELDS}
+        return await run_agent("valuation", {
+            "strategy": minify(strategy),
+            "company_data": values["company_data"]
+        })
+
+    async def run_due_diligence(values):
+        return await run_agent("due_diligence", values)
+
+    def run_chart_plan(values):
+        # Create the chart using the financial reports
+        combined_df = load_companies([co1, co2])
+        return analyze_companies([co1, co2], combined_df), combined_df
+
+    graph = AgentGraph()
+    graph.add("company_info_buyer", run_buyer_info)
+    graph.add("company_info_target", run_target_info)
+    graph.add("company_data", build_company_data, inputs=["company_info_buyer", "company_info_target"])
+    graph.add("strategy", run_strategy, inputs=agents["strategy"].inputs, streams=True)
+    # valuation takes its "strategy" input field by field from the streaming strategy node
+    valuation_inputs = [
+        dep for name in agents["valuation"].inputs
+        for dep in ([f"strategy.{field}" for field in VALUATION_STRATEGY_FIELDS] if name == "strategy" else [name])
+    ]
+    graph.add("valuation", run_valuation, inputs=valuation_inputs)
+    graph.add("due_diligence", run_due_diligence, inputs=agents["due_diligence"].inputs)
+    if has_financial_reports(co1, co2):
+        graph.add("chart_plan", run_chart_plan)
+    return graph
+
+
+def profile_input(name: str, description: str) -> dict:
+    # the CompanyInformationAgent input; prefetching must build exactly the same one
+    return {"company_name": name, "company_description": description}
+
+
+def run_input_hash(co1: str, co1_info: str, co2: str, co2_info: str) -> str:
+    # identifies the run in run_store.RunStore, so a failed run with the same inputs can resume
+    return fingerprint(co1, co1_info, co2, co2_info, has_financial_reports(co1, co2))
+
+
+def has_financial_reports(co1: str, co2: str) -> bool:
+    return company_file_exists(co1) and company_file_exists(co2)
+
+
+def analysis_outputs(results: dict) -> dict:
+    """The named outputs of a finished graph run, as the page keeps them in session state."""
+    outputs = {section: results[node] for section, node in SECTION_NODES.items()}
+    if "chart_plan" in results:
+        outputs["chart_plan"], outputs["df"] = results["chart_plan"]
+    else:
+        outputs["chart_plan"], outputs["df"] = "[]", pd.DataFrame()
+    return outputs
+
+
+def run_analysis(agents: dict, co1: str, co1_info: str, co2: str, co2_info: str, **run_options) -> dict:
+    """Run the whole comparison and return analysis_outputs(); `run_options` go to AgentGraph.run."""
+    graph = build_analysis_graph(agents, co1, co1_info, co2, co2_info)
+    return analysis_outputs(graph.run(**run_options))
+
+
+def format_sections(formatter, outputs: dict, max_workers: int = 3) -> dict:
+    return {key: result.content for key, result in formatter.run_batch(
+        {section: outputs[section] for section in SECTION_NODES}, max_workers=max_workers
+    )}
+
+
+def build_charts(chart_plan: str, df: pd.DataFrame):
+    charts_arr = read_charts(chart_plan)
+    return get_charts_fig(charts_arr, df), get_charts_analysis(charts_arr)
+
+
+def build_report(section_html: dict, chart_figs, chart_analysis) -> generate_report.ReportGenerator:
+    return generate_report.ReportGenerator(
+        co1=section_html["co1"],
+        co2=section_html["co2"],
+        strat=section_html["strategy"],
+        var=section_html["valuation"],
+        chart=chart_figs,
+        chart_analysis=chart_analysis or "",
+        due=section_html["due_diligence"]
+    )
@@ -0,0 +1,84 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from . import async_bridge, rate_limiter
+from .shared import process_singleton
+
+# how long an input must stay unchanged before its agent run is started
+PREFETCH_DELAY_SECONDS = float(os.getenv("PREFETCH_DELAY_SECONDS", 1.5))
+MAX_ENTRIES = 256
+
+
+class _Entry:
+    def __init__(self, params: str, timer: threading.Timer):
+        self.params = params
+        self.timer = timer
+        self.future = None
+
+
+class Prefetcher:
+    """Starts agent runs speculatively while the user is still typing; unclaimed answers still fill the LLM cache."""
+
+    def __init__(self, delay: float = PREFETCH_DELAY_SECONDS):
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self.stats = {"scheduled": 0, "started": 0, "claimed": 0, "missed": 0}
+
+    @staticmethod
+    def _params(json_input) -> str:
+        return json.dumps(json_input, sort_keys=True, default=str)
+
+    def schedule(self, slot: str, agent, json_input, session_id: str = "default"):
+        """Run `agent` once this input is left unchanged for `delay` seconds; a newer input for the slot replaces it."""
+        key = (session_id, slot)
+        params = self._params(json_input)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.params == params:
+                return
+            if entry is not None:
+                entry.timer.cancel()
+            timer = threading.Timer(self.delay, self._start, args=(key, params, agent, json_input, session_id))
+            timer.daemon = True
+            self._entries[key] = _Entry(params, timer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > MAX_ENTRIES:
+                self._entries.popitem(last=False)[1].timer.cancel()
+            self.stats["scheduled"] += 1
+        timer.start()
+
+    def _start(self, key, params, agent, json_input, session_id):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.params != params or entry.future is not None:
+                return
+            # speculative calls queue in the rate limiter as the session they are for
+            with rate_limiter.session(session_id):
+                entry.future = async_bridge.submit(agent.arun(json_input))
+            self.stats["started"] += 1
+
+    def claim(self, slot: str, json_input, session_id: str = "default"):
+        """The started run (a Future of the AgentResult) for this input, or None; an unstarted one is dropped."""
+        with self._lock:
+            entry = self._entries.pop((session_id, slot), None)
+            if entry is None:
+                return None
+            entry.timer.cancel()
+            if entry.future is None or entry.params != self._params(json_input):
+                self.stats["missed"] += 1
+                return None
+            self.stats["claimed"] += 1
+            return entry.future
+
+    def discard(self, session_id: str):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == session_id]:
+                self._entries.pop(key).timer.cancel()
+
+
+@process_singleton
+def get_prefetcher() -> Prefetcher:
+    return Prefetcher()
@@ -0,0 +1,169 @@
+import json
+import os
+import re
+import time
+import unicodedata
+from pathlib import Path
+
+from .shared import SqliteStore, process_singleton
+
+PROFILE_STORE_PATH = os.getenv("PROFILE_STORE_PATH", "data/profiles.sqlite")
+SEED_PATH = Path(__file__).with_name("profile_seeds.json")
+# names shorter than this only match exactly, never as a word inside a longer name
+MIN_CONTAINED_ALIAS = 4
+
+# legal forms dropped from names before matching, English and Thai, longest first
+# (NFKC-normalized like the names, which splits the Thai vowel "ำ" into two characters)
+LEGAL_SUFFIXES = sorted((unicodedata.normalize("NFKC", suffix) for suffix in [
+    "public company limited", "company limited", "co ltd", "co", "company", "ltd", "limited", "plc",
+    "pcl", "public", "inc", "incorporated", "corp", "corporation", "llc", "gmbh", "sdn bhd", "bhd", "pte",
+    "จำกัดมหาชน", "มหาชน", "จำกัด", "บมจ", "บจก",
+]), key=len, reverse=True)
+LEGAL_PREFIXES = ("บริษัท", "บจก", "บมจ")
+THAI = re.compile(r"[\u0e00-\u0e7f]")
+THAI_SPACE = re.compile(r"(?<=[\u0e00-\u0e7f])\s+|\s+(?=[\u0e00-\u0e7f])")
+
+
+def normalize_name(name: str) -> str:
+    """Matching key for a company name: "Central Plaza Hotel Public Co., Ltd." -> "central plaza hotel"."""
+    text = unicodedata.normalize("NFKC", name).casefold().replace("&", " and ")
+    # letters, digits and combining marks (Thai vowels and tones) are kept; everything else separates words
+    text = "".join(char if unicodedata.category(char)[0] in "LNM" else " " for char in text)
+    if THAI.search(text):
+        # Thai is written without spaces between words, so spacing must not matter
+        text = THAI_SPACE.sub("", text)
+    text = " ".join(text.split())
+    for prefix in LEGAL_PREFIXES:
+        if text.startswith(prefix):
+            text = text[len(prefix):].strip()
+    changed = True
+    while changed:
+        changed = False
+        for suffix in LEGAL_SUFFIXES:
+            if text.endswith(" " + suffix) or (text.endswith(suffix) and not suffix.isascii() and text != suffix):
+                text = text[: -len(suffix)].strip()
+                changed = True
+    return text
+
+
+class Profile:
+    def __init__(self, profile_id: int, role: str, name: str, content: str, source: str, approved_by: str | None):
+        self.id = profile_id
+        self.role = role
+        self.name = name
+        self.content = content
+        self.source = source
+        self.approved_by = approved_by
+
+
+class ProfileStore(SqliteStore):
+    """Vetted buyer/target profiles, looked up by normalize_name() of the company name or any alias."""
+
+    def __init__(self, path: str | Path = PROFILE_STORE_PATH, seed_path: Path | None = SEED_PATH):
+        super().__init__(path, """
+            CREATE TABLE IF NOT EXISTS profiles (
+                id INTEGER PRIMARY KEY,
+                role TEXT,
+                name TEXT,
+                content TEXT,
+                source TEXT,
+                approved_by TEXT,
+                updated_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS aliases (
+                role TEXT,
+                alias TEXT,
+                profile_id INTEGER,
+                PRIMARY KEY (role, alias)
+            );
+        """)
+        # aliases are kept in memory, so a lookup is a dictionary read plus, the first time, one primary-key query
+        self._index: dict[tuple[str, str], int] = {}
+        self._profiles: dict[int, Profile] = {}
+        # an empty store starts from the vetted seed profiles
+        if seed_path is not None and not self._conn.execute("SELECT 1 FROM profiles LIMIT 1").fetchone():
+            self._seed(seed_path)
+        self._load_index()
+
+    def _seed(self, seed_path: Path):
+        for seed in json.loads(seed_path.read_text(encoding="utf-8")):
+            self.put(seed["name"], seed["role"], json.dumps(seed["profile"], ensure_ascii=False, indent=2),
+                     aliases=seed.get("aliases", ()), source="seed", approved_by="seed")
+
+    def _load_index(self):
+        with self._lock:
+            self._index = {
+                (role, alias): profile_id
+                for role, alias, profile_id in self._conn.execute("SELECT role, alias, profile_id FROM aliases")
+            }
+
+    def _profile(self, profile_id: int) -> Profile | None:
+        # called with the lock held
+        profile = self._profiles.get(profile_id)
+        if profile is None:
+            row = self._conn.execute(
+                "SELECT role, name, content, source, approved_by FROM profiles WHERE id = ?", (profile_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            profile = self._profiles[profile_id] = Profile(profile_id, *row)
+        return profile
+
+    def lookup(self, name: str, role: str) -> Profile | None:
+        """The profile for `name` in `role` ("buyer" or "target"), or None."""
+        key = normalize_name(name)
+        if not key:
+            return None
+        with self._lock:
+            profile_id = self._index.get((role, key))
+            if profile_id is None:
+                # "Centel Hotels" still finds "centel": a known alias appearing as whole words
+                padded = f" {key} "
+                profile_id = next((
+                    pid for (alias_role, alias), pid in self._index.items()
+                    if alias_role == role and len(alias) >= MIN_CONTAINED_ALIAS and f" {alias} " in padded
+                ), None)
+            return self._profile(profile_id) if profile_id is not None else None
+
+    def put(self, name: str, role: str, content: str, aliases=(), source: str = "llm",
+            approved_by: str | None = None) -> Profile:
+        """Add or replace the profile of `name` (e.g. an approved LLM answer); returns it."""
+        json.loads(content)  # only valid JSON profiles are stored
+        keys = {normalize_name(alias) for alias in (name, *aliases)} - {""}
+        now = time.time()
+        with self._transaction() as conn:
+            existing = self._index.get((role, normalize_name(name)))
+            if existing is not None:
+                conn.execute(
+                    "UPDATE profiles SET name = ?, content = ?, source = ?, approved_by = ?, updated_at = ? WHERE id = ?",
+                    (name, content, source, approved_by, now, existing),
+                )
+                profile_id = existing
+            else:
+                profile_id = conn.execute(
+                    "INSERT INTO profiles (role, name, content, source, approved_by, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (role, name, content, source, approved_by, now),
+                ).lastrowid
+            conn.executemany(
+                "INSERT OR REPLACE INTO aliases VALUES (?, ?, ?)", [(role, key, profile_id) for key in keys]
+            )
+            for key in keys:
+                self._index[(role, key)] = profile_id
+            self._profiles.pop(profile_id, None)
+            return self._profile(profile_id)
+
+    def add_alias(self, name: str, role: str, alias: str) -> bool:
+        """Make `alias` find the profile already stored for `name`; False if there is none."""
+        profile = self.lookup(name, role)
+        key = normalize_name(alias)
+        if profile is None or not key:
+            return False
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO aliases VALUES (?, ?, ?)", (role, key, profile.id))
+            self._index[(role, key)] = profile.id
+        return True
+
+
+@process_singleton
+def get_profile_store() -> ProfileStore:
+    return ProfileStore()
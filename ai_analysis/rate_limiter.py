@@ -0,0 +1,336 @@
+import asyncio
+import contextvars
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+import openai
+
+from .telemetry import token_usage
+from .token_budget import count_tokens
+
+# Provider budgets per model; the defaults are OpenAI's tier-1 limits for gpt-4o
+RATE_LIMIT_RPM = float(os.getenv("LLM_RATE_LIMIT_RPM", 500))
+RATE_LIMIT_TPM = float(os.getenv("LLM_RATE_LIMIT_TPM", 30000))
+# completion tokens reserved per request until the real usage is known
+COMPLETION_ESTIMATE = int(os.getenv("LLM_RATE_LIMIT_COMPLETION_ESTIMATE", 1000))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 6))
+BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", 1.0))
+BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", 60.0))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+_session = contextvars.ContextVar("rate_limit_session", default="default")
+
+
+class TokenBucket:
+    """Holds up to `per_minute` units and refills continuously at per_minute / 60 per second."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # a request larger than the whole bucket waits for a full bucket rather than forever
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float):
+        # negative when a call used more than it reserved; the bucket then goes into debt
+        self.level = min(self.capacity, self.level + amount)
+
+
+class _Waiter:
+    def __init__(self, amount: float, grant):
+        self.amount = amount
+        self.grant = grant
+        self.cancelled = False
+        self.granted = False
+
+
+class RateLimiter:
+    """Admits LLM requests within a requests-per-minute and a tokens-per-minute budget, round robin across sessions."""
+
+    def __init__(self, rpm: float = RATE_LIMIT_RPM, tpm: float = RATE_LIMIT_TPM):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._lock = threading.Lock()
+        # one queue per session, threads and coroutines alike, so one session's burst cannot starve another's
+        self._queues: OrderedDict[str, deque] = OrderedDict()
+        self._paused_until = 0.0
+        self._timer: threading.Timer | None = None
+        self._wake_at = None
+        self.stats = {"admitted": 0, "queued": 0, "throttled": 0, "retries": 0}
+
+    def _submit(self, amount: float, session: str, grant) -> _Waiter:
+        waiter = _Waiter(amount, grant)
+        with self._lock:
+            self._queues.setdefault(session, deque()).append(waiter)
+        self._dispatch()
+        return waiter
+
+    def _dispatch(self):
+        with self._lock:
+            while self._queues:
+                session, queue = next(iter(self._queues.items()))
+                while queue and queue[0].cancelled:
+                    queue.popleft()
+                if not queue:
+                    del self._queues[session]
+                    continue
+                waiter = queue[0]
+                now = time.monotonic()
+                wait = max(
+                    self._paused_until - now,
+                    self.requests.wait_time(1, now),
+                    self.tokens.wait_time(waiter.amount, now),
+                )
+                if wait > 0:
+                    self.stats["queued"] += 1
+                    self._wake_later(wait)
+                    return
+                self.requests.take(1)
+                self.tokens.take(waiter.amount)
+                self.stats["admitted"] += 1
+                queue.popleft()
+                # this session is served again only after every other waiting session
+                if queue:
+                    self._queues.move_to_end(session)
+                else:
+                    del self._queues[session]
+                waiter.granted = True
+                waiter.grant()
+
+    def _wake_later(self, wait: float):
+        # called with the lock held; one timer re-runs _dispatch when the head of the queue fits
+        now = time.monotonic()
+        if self._wake_at is not None and now < self._wake_at <= now + wait:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(wait, self._dispatch)
+        self._timer.daemon = True
+        self._wake_at = now + wait
+        self._timer.start()
+
+    def acquire(self, amount: float, session: str | None = None):
+        """Block until a request of `amount` tokens may be sent."""
+        admitted = threading.Event()
+        self._submit(amount, session or _session.get(), admitted.set)
+        admitted.wait()
+
+    async def aacquire(self, amount: float, session: str | None = None):
+        loop = asyncio.get_running_loop()
+        admitted = loop.create_future()
+
+        def grant():
+            loop.call_soon_threadsafe(lambda: admitted.done() or admitted.set_result(None))
+
+        waiter = self._submit(amount, session or _session.get(), grant)
+        try:
+            await admitted
+        except asyncio.CancelledError:
+            with self._lock:
+                waiter.cancelled = True
+                granted = waiter.granted
+            # admitted just before the cancel arrived: the request is never sent, so its reservation goes back
+            if granted:
+                self.settle(amount, 0)
+            raise
+
+    def settle(self, reserved: float, used: float | None):
+        """Correct the token budget once the real usage of an admitted request is known."""
+        if used is None:
+            return
+        with self._lock:
+            self.tokens.give_back(reserved - used)
+        self._dispatch()
+
+    def pause(self, seconds: float):
+        # stops all admissions, e.g. after the provider answered 429
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self.stats["throttled"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            self.requests._refill(now)
+            self.tokens._refill(now)
+            return {
+                **self.stats,
+                "waiting": sum(len(queue) for queue in self._queues.values()),
+                "sessions_waiting": len(self._queues),
+                "requests_available": round(self.requests.level, 1),
+                "tokens_available": round(self.tokens.level),
+                "paused_s": round(max(0.0, self._paused_until - now), 2),
+            }
+
+
+_limiters: dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(model: str) -> RateLimiter:
+    # provider limits apply per model, and so does the limiter
+    with _limiters_lock:
+        if model not in _limiters:
+            _limiters[model] = RateLimiter()
+        return _limiters[model]
+
+
+def limiter_stats() -> dict:
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {model: limiter.snapshot() for model, limiter in limiters.items()}
+
+
+@contextmanager
+def session(session_id: str):
+    """Queue the LLM calls made in this context (and graph nodes started from it) as `session_id`."""
+    token = _session.set(session_id)
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+
+def _model(llm) -> str:
+    return getattr(llm, "model_name", None) or getattr(llm, "model", "")
+
+
+def _estimate(llm, prompt) -> int:
+    max_tokens = getattr(llm, "max_tokens", None) or COMPLETION_ESTIMATE
+    return count_tokens(str(prompt), _model(llm)) + max_tokens
+
+
+def _used_tokens(response) -> int | None:
+    prompt_tokens, completion_tokens = token_usage(response)
+    if prompt_tokens is None or completion_tokens is None:
+        return None
+    return prompt_tokens + completion_tokens
+
+
+def _retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return getattr(error, "status_code", None) in RETRYABLE_STATUS
+
+
+def _backoff(limiter: RateLimiter, attempt: int, error: Exception) -> float:
+    """Seconds to wait before retrying; a 429 also pauses every other caller of this model."""
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    if getattr(error, "status_code", None) == 429:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        try:
+            retry_after = float(headers.get("retry-after", 0))
+        except (TypeError, ValueError):
+            retry_after = 0.0
+        limiter.pause(max(retry_after, BACKOFF_BASE))
+        delay = max(delay, retry_after)
+    with limiter._lock:
+        limiter.stats["retries"] += 1
+    return delay
+
+
+def _streamed_usage(used: int | None, started: bool) -> int | None:
+    # refunded if it ended before the first chunk; once tokens flowed, unknown usage keeps the estimate
+    return used if used is not None or started else 0
+
+
+def invoke(llm, prompt):
+    """`llm.invoke(prompt)` admitted by the model's rate limiter and retried on 429 / transient errors."""
+    limiter = get_limiter(_model(llm))
+    estimate = _estimate(llm, prompt)
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.acquire(estimate)
+        # from here the request has been sent: unless the response reports its usage, the estimate stands
+        used = None
+        try:
+            response = llm.invoke(prompt)
+            used = _used_tokens(response)
+            return response
+        except Exception as error:
+            if attempt == MAX_RETRIES or not _retryable(error):
+                raise
+            delay = _backoff(limiter, attempt, error)
+        finally:
+            # every admitted request is settled, including interrupted ones
+            limiter.settle(estimate, used)
+        time.sleep(delay)
+
+
+async def ainvoke(llm, prompt):
+    limiter = get_limiter(_model(llm))
+    estimate = _estimate(llm, prompt)
+    for attempt in range(MAX_RETRIES + 1):
+        await limiter.aacquire(estimate)
+        used = None
+        try:
+            response = await llm.ainvoke(prompt)
+            used = _used_tokens(response)
+            return response
+        except Exception as error:
+            if attempt == MAX_RETRIES or not _retryable(error):
+                raise
+            delay = _backoff(limiter, attempt, error)
+        finally:
+            limiter.settle(estimate, used)
+        await asyncio.sleep(delay)
+
+
+def stream(llm, prompt, **kwargs):
+    """Like invoke, for `llm.stream`; a call is only retried if it failed before its first chunk."""
+    limiter = get_limiter(_model(llm))
+    estimate = _estimate(llm, prompt)
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.acquire(estimate)
+        used, started = None, False
+        try:
+            for chunk in llm.stream(prompt, **kwargs):
+                started = True
+                used = _used_tokens(chunk) or used
+                yield chunk
+            return
+        except Exception as error:
+            if started or attempt == MAX_RETRIES or not _retryable(error):
+                raise
+            delay = _backoff(limiter, attempt, error)
+        finally:
+            # also when the consumer stops early (GeneratorExit) or its task is cancelled
+            limiter.settle(estimate, _streamed_usage(used, started))
+        time.sleep(delay)
+
+
+async def astream(llm, prompt, **kwargs):
+    limiter = get_limiter(_model(llm))
+    estimate = _estimate(llm, prompt)
+    for attempt in range(MAX_RETRIES + 1):
+        await limiter.aacquire(estimate)
+        used, started = None, False
+        try:
+            async for chunk in llm.astream(prompt, **kwargs):
+                started = True
+                used = _used_tokens(chunk) or used
+                yield chunk
+            return
+        except Exception as error:
+            if started or attempt == MAX_RETRIES or not _retryable(error):
+                raise
+            delay = _backoff(limiter, attempt, error)
+        finally:
+            limiter.settle(estimate, _streamed_usage(used, started))
+        await asyncio.sleep(delay)
@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from .shared import SqliteStore, process_singleton
+
+RUN_STORE_PATH = os.getenv("RUN_STORE_PATH", ".cache/runs.sqlite")
+RUN_STORE_TTL_SECONDS = float(os.getenv("RUN_STORE_TTL_SECONDS", 7 * 24 * 3600))
+# a running run not heartbeated for this long is taken to have lost its owner (crash, restart) and may be resumed
+RUN_LEASE_SECONDS = float(os.getenv("RUN_LEASE_SECONDS", 60))
+
+
+class RunStore(SqliteStore):
+    """Each finished stage's output per pipeline run, found again by input hash to resume a failed run."""
+
+    def __init__(self, path: str | Path = RUN_STORE_PATH, ttl_seconds: float = RUN_STORE_TTL_SECONDS,
+                 lease_seconds: float = RUN_LEASE_SECONDS):
+        super().__init__(path, """
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                input_hash TEXT,
+                inputs TEXT,
+                status TEXT,
+                error TEXT,
+                created_at REAL,
+                updated_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS runs_input_hash ON runs (input_hash, updated_at);
+            CREATE TABLE IF NOT EXISTS stages (
+                run_id TEXT,
+                stage TEXT,
+                output TEXT,
+                completed_at REAL,
+                PRIMARY KEY (run_id, stage)
+            );
+        """)
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+
+    def start(self, input_hash: str, inputs=None) -> tuple[str, dict]:
+        """Resume the latest failed or abandoned run for these inputs, or start a new one.
+
+        A run still held by a live owner (see `lease`) is never resumed; a
+        concurrent duplicate gets a run of its own. Returns (run_id, {stage:
+        output} of the stages that already completed).
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            self._delete_older("runs", now - self.ttl_seconds, key="run_id", children=("stages",))
+            row = conn.execute(
+                "SELECT run_id FROM runs WHERE input_hash = ? "
+                "AND (status = 'failed' OR (status = 'running' AND updated_at < ?)) "
+                "ORDER BY updated_at DESC LIMIT 1",
+                (input_hash, now - self.lease_seconds),
+            ).fetchone()
+            if row is not None:
+                run_id = row[0]
+                conn.execute("UPDATE runs SET status = 'running', updated_at = ? WHERE run_id = ?", (now, run_id))
+            else:
+                run_id = uuid.uuid4().hex[:12]
+                conn.execute(
+                    "INSERT INTO runs VALUES (?, ?, ?, 'running', NULL, ?, ?)",
+                    (run_id, input_hash, json.dumps(inputs, default=str), now, now),
+                )
+        return run_id, self.stages(run_id)
+
+    def save_stage(self, run_id: str, stage: str, output: str) -> None:
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO stages VALUES (?, ?, ?, ?)", (run_id, stage, output, now))
+            conn.execute("UPDATE runs SET updated_at = ? WHERE run_id = ?", (now, run_id))
+
+    def heartbeat(self, run_id: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("UPDATE runs SET updated_at = ? WHERE run_id = ? AND status = 'running'", (time.time(), run_id))
+
+    @contextmanager
+    def lease(self, run_id: str):
+        """Heartbeat `run_id` from a background thread while the block runs, so no one else resumes it."""
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(self.lease_seconds / 3):
+                self.heartbeat(run_id)
+
+        thread = threading.Thread(target=beat, name=f"lease-{run_id}", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def stages(self, run_id: str) -> dict:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT stage, output FROM stages WHERE run_id = ? ORDER BY completed_at", (run_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def finish(self, run_id: str, error: Exception | None = None) -> None:
+        """Mark the run complete, or failed (resumable) when `error` is given."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE runs SET status = ?, error = ?, updated_at = ? WHERE run_id = ?",
+                ("failed" if error is not None else "complete", repr(error) if error is not None else None,
+                 time.time(), run_id),
+            )
+
+    def status(self, run_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT input_hash, inputs, status, error, created_at, updated_at FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("input_hash", "inputs", "status", "error", "created_at", "updated_at")
+        return {"run_id": run_id, **dict(zip(keys, row)), "inputs": json.loads(row[1] or "null")}
+
+
+@process_singleton
+def get_run_store() -> RunStore:
+    return RunStore()
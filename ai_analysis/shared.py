@@ -0,0 +1,50 @@
+import functools
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+
+def process_singleton(factory):
+    """Decorator: the first call builds the instance, every later call in the process returns it."""
+    lock = threading.Lock()
+    instance = None
+
+    @functools.wraps(factory)
+    def get(*args, **kwargs):
+        nonlocal instance
+        with lock:
+            if instance is None:
+                instance = factory(*args, **kwargs)
+        return instance
+
+    return get
+
+
+class SqliteStore:
+    """Base for the on-disk stores: one WAL-mode connection per instance, each use of it under `_lock`."""
+
+    def __init__(self, path: str | Path, schema: str):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # shared by every thread; WAL lets readers in other processes go on while one writes
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(schema)
+        self._conn.commit()
+
+    @contextmanager
+    def _transaction(self):
+        # committed when the block ends, rolled back if it raises
+        with self._lock, self._conn:
+            yield self._conn
+
+    def _delete_older(self, table: str, cutoff: float, column: str = "updated_at", key: str = "",
+                      children: tuple[str, ...] = ()) -> None:
+        """Delete `table` rows whose `column` is before `cutoff`, and their rows in `children` (joined on `key`)."""
+        for child in children:
+            self._conn.execute(
+                f"DELETE FROM {child} WHERE {key} IN (SELECT {key} FROM {table} WHERE {column} < ?)", (cutoff,)
+            )
+        self._conn.execute(f"DELETE FROM {table} WHERE {column} < ?", (cutoff,))
@@ -0,0 +1,152 @@
+import asyncio
+import threading
+from concurrent.futures import Future, wait
+
+from .shared import process_singleton
+
+
+class _Listener:
+    def __init__(self, on_token, leader: bool):
+        self.on_token = on_token
+        self.leader = leader
+        self.error = None
+
+
+class _Flight:
+    def __init__(self):
+        self.future = Future()
+        self._lock = threading.Lock()
+        self._tokens: list[str] = []
+        self._listeners: list[_Listener] = []
+        self.followers = 0
+
+    def listen(self, on_token, leader: bool = False) -> _Listener:
+        listener = _Listener(on_token, leader)
+        with self._lock:
+            # a late follower first catches up on what was already streamed
+            for text in self._tokens:
+                self._deliver(listener, text)
+            self._listeners.append(listener)
+        return listener
+
+    def publish(self, text: str):
+        with self._lock:
+            self._tokens.append(text)
+            for listener in self._listeners:
+                self._deliver(listener, text)
+
+    @staticmethod
+    def _deliver(listener: _Listener, text: str):
+        if listener.error is not None:
+            return
+        try:
+            listener.on_token(text)
+        except Exception as error:
+            # the leader fails like an unshared call would; a follower's error is raised in the follower
+            if listener.leader:
+                raise
+            listener.error = error
+
+
+async def _wait(future: Future):
+    # asyncio.wrap_future would cancel the shared call when just this waiter is cancelled
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+    future.add_done_callback(lambda _: loop.call_soon_threadsafe(lambda: done.done() or done.set_result(None)))
+    await done
+
+
+class SingleFlight:
+    """Runs concurrent identical calls once and hands every caller, thread or coroutine, the same result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: dict[str, _Flight] = {}
+        self.stats = {"calls": 0, "shared": 0}
+
+    def _join(self, key: str) -> tuple[_Flight, bool]:
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                flight.followers += 1
+                self.stats["shared"] += 1
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            self.stats["calls"] += 1
+            return flight, True
+
+    def _land(self, key: str, flight: _Flight, result=None, error: BaseException | None = None):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        if error is None:
+            flight.future.set_result(result)
+        elif isinstance(error, Exception):
+            flight.future.set_exception(error)
+        else:
+            flight.future.cancel()
+
+    def _land_task(self, key: str, flight: _Flight, task: asyncio.Future):
+        if task.cancelled():
+            self._land(key, flight, error=asyncio.CancelledError())
+        elif task.exception() is not None:
+            self._land(key, flight, error=task.exception())
+        else:
+            self._land(key, flight, task.result())
+
+    @staticmethod
+    def _followed(flight: _Flight, listener: _Listener | None):
+        result = flight.future.result()
+        if listener is not None and listener.error is not None:
+            raise listener.error
+        return result
+
+    def do(self, key: str, fn, on_token=None):
+        """Returns (fn's result, shared): shared is True if another caller's call was reused.
+
+        The first caller of `key` runs `fn(publish)`; everything it publishes reaches
+        every caller's `on_token`, late ones included, and its error is raised in all.
+        """
+        while True:
+            flight, leader = self._join(key)
+            listener = flight.listen(on_token, leader) if on_token is not None else None
+            if leader:
+                break
+            wait([flight.future])
+            if flight.future.cancelled():
+                continue
+            return self._followed(flight, listener), True
+        try:
+            result = fn(flight.publish)
+        except BaseException as error:
+            self._land(key, flight, error=error)
+            raise
+        self._land(key, flight, result)
+        return result, False
+
+    async def ado(self, key: str, fn, on_token=None):
+        """Like do, for a coroutine function `fn(publish)`; a cancelled leader leaves the call to its followers."""
+        while True:
+            flight, leader = self._join(key)
+            listener = flight.listen(on_token, leader) if on_token is not None else None
+            if leader:
+                break
+            await _wait(flight.future)
+            if flight.future.cancelled():
+                continue
+            return self._followed(flight, listener), True
+        # the call runs as its own task, so a cancelled leader can leave it running for its followers
+        task = asyncio.ensure_future(fn(flight.publish))
+        task.add_done_callback(lambda _: self._land_task(key, flight, task))
+        try:
+            await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not flight.followers:
+                task.cancel()
+            raise
+        return task.result(), False
+
+
+@process_singleton
+def get_single_flight() -> SingleFlight:
+    return SingleFlight()
@@ -0,0 +1,146 @@
+import json
+import re
+
+
+# the root value begins a line, or directly follows a ``` / ```json fence; brackets inside prose are skipped
+_ROOT_START = re.compile(r"(?:^[ \t]*|```(?:json)?[ \t]*)([{[])", re.MULTILINE | re.IGNORECASE)
+
+
+class StreamingJSONParser:
+    """Incremental JSON parser for streamed LLM output, reporting object fields as soon as they are complete."""
+
+    def __init__(self, max_depth: int = 2):
+        self.max_depth = max_depth
+        self.text = ""
+        self.fields: dict[tuple, object] = {}
+        self.done = False
+        self._raw = ""
+        # where the search for a root starts, and the root being parsed (indices into _raw)
+        self._scan = 0
+        self._root = None
+        self._next = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._token_start = None
+
+    def feed(self, chunk: str) -> list[tuple[tuple, object]]:
+        """(path of keys, value) of each object field this chunk completed; arrays are reported whole.
+
+        Text before the root value (e.g. a ```json fence) and after it is ignored. A
+        candidate root that turns out not to be JSON is dropped and the search goes on
+        after its first bracket.
+        """
+        completed = []
+        if self.done:
+            return completed
+        self._raw += chunk
+        while not self.done:
+            if self._root is None:
+                match = _ROOT_START.search(self._raw, self._scan)
+                if match is None:
+                    # only the last line can still turn into a root start
+                    self._scan = max(self._scan, self._raw.rfind("\n") + 1)
+                    break
+                self._root = self._next = match.start(1)
+            if self._parse(completed):
+                break
+            self._restart(self._root + 1)
+        return completed
+
+    def result(self):
+        """The root value once it has closed; otherwise the first JSON value found before any unfinished root."""
+        if self.done:
+            return json.loads(self.text)
+        decoder = json.JSONDecoder()
+        for match in re.finditer(r"[{[]", self._raw[:self._root]):
+            try:
+                return decoder.raw_decode(self._raw, match.start())[0]
+            except ValueError:
+                continue
+        return None
+
+    def _parse(self, completed: list) -> bool:
+        # False if the candidate root is not valid JSON
+        for i in range(self._next, len(self._raw)):
+            try:
+                self._step(self._raw[i], i, completed)
+            except ValueError:
+                return False
+            self._next = i + 1
+            if self.done:
+                self.text = self._raw[self._root:i + 1]
+                try:
+                    json.loads(self.text)
+                except ValueError:
+                    self.done = False
+                    return False
+                return True
+        return True
+
+    def _restart(self, scan: int):
+        self.text = ""
+        self.fields = {}
+        self._scan = scan
+        self._root = None
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._token_start = None
+
+    def _step(self, char: str, i: int, completed: list):
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+                self._string_done(self._token_start, i + 1, completed)
+                self._token_start = None
+            return
+
+        if self._token_start is not None and char in ",}] \t\r\n":
+            # end of a number / true / false / null
+            self._value_done(self._token_start, i, completed)
+            self._token_start = None
+
+        if char == '"':
+            self._in_string = True
+            self._token_start = i
+        elif char in "{[":
+            self._stack.append({"kind": char, "start": i, "phase": "key" if char == "{" else "value", "key": None})
+        elif char in "}]":
+            frame = self._stack.pop()
+            if (char == "}") != (frame["kind"] == "{"):
+                raise ValueError("mismatched bracket")
+            if not self._stack:
+                self.done = True
+                return
+            self._value_done(frame["start"], i + 1, completed)
+        elif char == ":":
+            self._stack[-1]["phase"] = "value"
+        elif char == ",":
+            frame = self._stack[-1]
+            frame["phase"] = "key" if frame["kind"] == "{" else "value"
+        elif char not in " \t\r\n" and self._token_start is None:
+            self._token_start = i
+
+    def _string_done(self, start: int, end: int, completed: list):
+        frame = self._stack[-1]
+        if frame["kind"] == "{" and frame["phase"] == "key":
+            frame["key"] = json.loads(self._raw[start:end])
+            frame["phase"] = "colon"
+        else:
+            self._value_done(start, end, completed)
+
+    def _value_done(self, start: int, end: int, completed: list):
+        if len(self._stack) > self.max_depth or any(frame["kind"] != "{" for frame in self._stack):
+            return
+        path = tuple(frame["key"] for frame in self._stack)
+        try:
+            value = json.loads(self._raw[start:end])
+        except ValueError:
+            return
+        self.fields[path] = value
+        completed.append((path, value))
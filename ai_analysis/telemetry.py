@@ -0,0 +1,132 @@
+import contextvars
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+TRACE_DIR = Path("runs/traces")
+
+# USD per 1M (prompt, completion) tokens
+MODEL_PRICES = {
+    "gpt-4o-2024-05-13": (5.00, 15.00),
+    "gpt-4o-2024-08-06": (2.50, 10.00),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+_current_run = contextvars.ContextVar("current_run", default=None)
+
+
+def token_usage(response) -> tuple[int | None, int | None]:
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens"), usage.get("output_tokens")
+    usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens"), usage.get("completion_tokens")
+
+
+def call_cost(model: str | None, prompt_tokens: int | None, completion_tokens: int | None) -> float | None:
+    prices = MODEL_PRICES.get(model or "")
+    if prices is None or prompt_tokens is None or completion_tokens is None:
+        return None
+    return (prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000
+
+
+class RunTelemetry:
+    """Collects one record per LLM call of a pipeline run and appends it to a JSONL trace."""
+
+    def __init__(self, run_id: str | None = None, trace_dir: Path | None = TRACE_DIR):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.records: list[dict] = []
+        self._lock = threading.Lock()
+        self.trace_path = None
+        if trace_dir is not None:
+            Path(trace_dir).mkdir(parents=True, exist_ok=True)
+            self.trace_path = Path(trace_dir) / f"{self.run_id}.jsonl"
+
+    @classmethod
+    def resume(cls, run_id: str, trace_dir: Path = TRACE_DIR) -> "RunTelemetry":
+        """The run `run_id` with the records already in its trace; new records are appended to it."""
+        run = cls(run_id, trace_dir)
+        if run.trace_path.exists():
+            with open(run.trace_path, encoding="utf-8") as trace:
+                run.records = [json.loads(line) for line in trace if line.strip()]
+        return run
+
+    def record(self, **fields) -> dict:
+        record = {"run_id": self.run_id, "timestamp": time.time(), **fields}
+        with self._lock:
+            self.records.append(record)
+            if self.trace_path is not None:
+                with open(self.trace_path, "a", encoding="utf-8") as trace:
+                    trace.write(json.dumps(record, default=str) + "\n")
+        return record
+
+    def to_frame(self) -> pd.DataFrame:
+        with self._lock:
+            return pd.DataFrame(self.records)
+
+    def summary(self) -> pd.DataFrame:
+        """Per-agent breakdown: calls, wall time, tokens, cost, cache hits and shared in-flight calls."""
+        df = self.to_frame()
+        if df.empty:
+            return df
+        return (
+            df.groupby("agent")
+            .agg(
+                calls=("agent", "size"),
+                wall_time_s=("wall_time_s", "sum"),
+                max_wall_time_s=("wall_time_s", "max"),
+                prompt_tokens=("prompt_tokens", "sum"),
+                completion_tokens=("completion_tokens", "sum"),
+                cost_usd=("cost_usd", "sum"),
+                cache_hits=("cache", lambda status: int((status == "hit").sum())),
+                shared_calls=("cache", lambda status: int((status == "shared").sum())),
+            )
+            .sort_values("wall_time_s", ascending=False)
+        )
+
+
+@contextmanager
+def activate(run: RunTelemetry):
+    """Make `run` receive the records of every agent call made in this context.
+
+    The context is inherited by AgentGraph worker threads and event-loop tasks.
+    """
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+
+
+def current_run() -> RunTelemetry | None:
+    return _current_run.get()
+
+
+def record_call(agent: str, model: str | None, started: float, response=None, cache: str | None = None,
+                error: Exception | None = None, **extra):
+    """Report one LLM call (started = time.perf_counter() before it) to the active run, if any."""
+    run = _current_run.get()
+    if run is None:
+        return None
+    prompt_tokens, completion_tokens = (None, None)
+    # a cache hit, or another session's in-flight call, did not spend tokens on this run
+    if response is not None and cache not in ("hit", "shared"):
+        prompt_tokens, completion_tokens = token_usage(response)
+    return run.record(
+        agent=agent,
+        model=model,
+        status="error" if error is not None else "ok",
+        error=repr(error) if error is not None else None,
+        cache=cache,
+        wall_time_s=round(time.perf_counter() - started, 3),
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        cost_usd=call_cost(model, prompt_tokens, completion_tokens),
+        **extra,
+    )
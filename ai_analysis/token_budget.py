@@ -0,0 +1,145 @@
+import json
+import os
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:  # tiktoken ships with langchain-openai, but counting still works without it
+    tiktoken = None
+
+DEFAULT_MODEL = "gpt-4o-2024-05-13"
+# strings longer than this are shortened before list items are dropped
+MIN_STRING_CHARS = 80
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # tiktoken downloads its BPE files on first use; offline we fall back to estimating
+        return None
+
+
+def count_tokens(text: str, model: str = DEFAULT_MODEL) -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def configured_budget(agent_name: str, default: int | None) -> int | None:
+    # e.g. TOKEN_BUDGET_VALUATIONAGENT=3000 overrides ValuationAgent's input budget; 0 disables it
+    value = os.getenv(f"TOKEN_BUDGET_{agent_name.upper()}")
+    if value is None:
+        return default
+    return int(value) or None
+
+
+def minify(data) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def prune(data, keep):
+    """Keep only the dotted paths in `keep` (e.g. "target.financials"); unknown paths are ignored."""
+    if not keep or not isinstance(data, dict):
+        return data
+    pruned = {}
+    for path in keep:
+        source, target = data, pruned
+        parts = path.split(".")
+        for i, part in enumerate(parts):
+            if not isinstance(source, dict) or part not in source:
+                break
+            if i == len(parts) - 1:
+                target[part] = source[part]
+            else:
+                source = source[part]
+                target = target.setdefault(part, {})
+    # a schema the spec does not know about is passed through rather than emptied
+    return pruned or data
+
+
+def _largest(data, kind):
+    # (size, container, key) of the largest value of type `kind` anywhere inside data
+    best = None
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        items = node.items() if isinstance(node, dict) else enumerate(node) if isinstance(node, list) else ()
+        for key, value in items:
+            if isinstance(value, kind) and (best is None or len(value) > best[0]):
+                best = (len(value), node, key)
+            if isinstance(value, (dict, list)):
+                stack.append(value)
+    return best
+
+
+def fit_to_budget(data, budget: int, model: str = DEFAULT_MODEL):
+    """Shrink parsed JSON until its minified form fits in `budget` tokens.
+
+    Long strings are halved first, then the longest lists lose their last items and
+    finally the largest objects lose their last keys.
+    """
+    # wrapped so the root object or list can be shrunk like any nested one
+    root = [json.loads(json.dumps(data))]
+    while count_tokens(minify(root[0]), model) > budget:
+        longest = _largest(root, str)
+        if longest and longest[0] > MIN_STRING_CHARS:
+            size, node, key = longest
+            node[key] = node[key][: size // 2] + "…"
+            continue
+        longest = _largest(root, list)
+        if longest and longest[0] > 1:
+            size, node, key = longest
+            node[key] = node[key][:-1]
+            continue
+        longest = _largest(root, dict)
+        if longest and longest[0] > 1:
+            size, node, key = longest
+            node[key].popitem()
+            continue
+        break
+    return root[0]
+
+
+def compact_value(value, keep=None, budget: int | None = None, model: str = DEFAULT_MODEL) -> str:
+    """Minify a JSON string (or object), keep only the `keep` paths and enforce `budget` tokens."""
+    data = value
+    if isinstance(value, str):
+        try:
+            data = json.loads(value)
+        except ValueError:
+            if budget and count_tokens(value, model) > budget:
+                return value[: budget * 4] + "…"
+            return value
+    data = prune(data, keep)
+    if budget:
+        data = fit_to_budget(data, budget, model)
+    return minify(data)
+
+
+def compact_input(json_input, fields: dict, budget: int | None, model: str = DEFAULT_MODEL):
+    """Compact an agent input: a single JSON string, or a dict of named JSON strings.
+
+    For a dict, the budget is shared between the values in proportion to their
+    size after pruning, so the largest inputs give up the most.
+    """
+    if not isinstance(json_input, dict):
+        return compact_value(json_input, fields.get(None), budget, model)
+    pruned = {key: compact_value(value, fields.get(key), None, model) for key, value in json_input.items()}
+    if not budget:
+        return pruned
+    sizes = {key: count_tokens(value, model) for key, value in pruned.items()}
+    total = sum(sizes.values())
+    if total <= budget:
+        return pruned
+    return {
+        key: compact_value(value, None, max(1, budget * sizes[key] // total), model)
+        for key, value in pruned.items()
+    }
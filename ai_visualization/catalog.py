@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from ai_analysis.shared import process_singleton
+from ai_visualization.data_store import CompanyDataStore, get_data_store
+
+DATA_DIR = os.getenv("DATA_DIR", "data")
+# source formats in lookup order; when a company has both, the first one is used
+SOURCE_EXTENSIONS = ("xlsx", "csv")
+# how long a directory listing is trusted before `data/` is listed again
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", 5))
+
+
+class DatasetEntry:
+    def __init__(self, name: str, path: Path, signature: tuple):
+        self.name = name
+        self.path = path
+        self.format = path.suffix.lstrip(".")
+        self.signature = signature
+        self._metadata = None
+
+
+class DatasetCatalog:
+    """The company data files under `data/`, listed from memory and rescanned at most every `refresh_seconds`."""
+
+    def __init__(self, data_dir: str | Path = DATA_DIR, data_store: CompanyDataStore | None = None,
+                 refresh_seconds: float = CATALOG_REFRESH_SECONDS):
+        self.data_dir = Path(data_dir)
+        self.data_store = data_store
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._entries: dict[str, DatasetEntry] = {}
+        self._scanned_at = None
+
+    def refresh(self, force: bool = False) -> None:
+        with self._lock:
+            if not force and self._scanned_at is not None and time.monotonic() - self._scanned_at < self.refresh_seconds:
+                return
+            found = {}
+            try:
+                files = list(os.scandir(self.data_dir))
+            except FileNotFoundError:
+                files = []
+            for item in files:
+                stem, _, ext = item.name.rpartition(".")
+                if not stem or ext not in SOURCE_EXTENSIONS or not item.is_file():
+                    continue
+                current = found.get(stem.lower())
+                if current is not None and SOURCE_EXTENSIONS.index(current.name.rpartition(".")[2]) < SOURCE_EXTENSIONS.index(ext):
+                    continue
+                found[stem.lower()] = item
+            entries = {}
+            for key, item in found.items():
+                stat = item.stat()
+                path, signature = Path(item.path), (stat.st_mtime_ns, stat.st_size)
+                entry = self._entries.get(key)
+                if entry is None or entry.path != path or entry.signature != signature:
+                    entry = DatasetEntry(path.stem, path, signature)
+                entries[key] = entry
+            self._entries = entries
+            self._scanned_at = time.monotonic()
+
+    def get(self, company_name: str) -> DatasetEntry | None:
+        self.refresh()
+        with self._lock:
+            return self._entries.get(company_name.strip().lower())
+
+    def exists(self, company_name: str) -> bool:
+        return self.get(company_name) is not None
+
+    def companies(self) -> list[str]:
+        """Names of every company with a data file, sorted."""
+        self.refresh()
+        with self._lock:
+            return sorted((entry.name for entry in self._entries.values()), key=str.lower)
+
+    def metadata(self, company_name: str) -> dict | None:
+        """File, format, rows, (first, last) year and subcategories of the company's data; None if it has none."""
+        entry = self.get(company_name)
+        if entry is None:
+            return None
+        if entry._metadata is None:
+            # read once per file version, so listing many companies never parses their files
+            df = (self.data_store or get_data_store()).load_file(entry.path)
+            years = pd.to_numeric(df["Year"], errors="coerce").dropna() if "Year" in df else pd.Series(dtype=float)
+            entry._metadata = {
+                "name": entry.name,
+                "path": str(entry.path),
+                "format": entry.format,
+                "rows": len(df),
+                "years": (int(years.min()), int(years.max())) if len(years) else None,
+                "subcategories": frozenset(df["Subcategory"].dropna().astype(str)) if "Subcategory" in df else frozenset(),
+            }
+        return entry._metadata
+
+
+@process_singleton
+def get_catalog() -> DatasetCatalog:
+    return DatasetCatalog()
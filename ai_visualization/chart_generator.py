@@ -3,6 +3,8 @@ import re
 import streamlit as st
 import plotly.express as px
 
+from ai_visualization.metric_cube import get_cube
+
 def clean_json_output(llm_output: str):
     cleaned = re.sub(r"^```(?:json)?|```$", "", llm_output.strip(), flags=re.MULTILINE)
     return cleaned.strip()
@@ -15,8 +17,21 @@ def read_charts(chart_json_str):
         return []
     return charts
 
+def company_style(df):
+    # every company keeps its colour and legend position across charts; the default palette repeats after 10
+    cube = get_cube(df)
+    companies = list(cube.frame["Company"].cat.categories)
+    palette = px.colors.qualitative.Plotly
+    if len(companies) > len(palette):
+        palette = px.colors.qualitative.Alphabet + px.colors.qualitative.Light24
+    return {
+        "category_orders": {"Company": companies},
+        "color_discrete_map": {company: palette[i % len(palette)] for i, company in enumerate(companies)},
+    }
+
 def create_chart_line(df, chart):
-    scope = df[df["Subcategory"] == chart["filter"]['Subcategory']] 
+    # the cube is built once per data frame; every chart after the first only looks its rows up
+    scope = get_cube(df).select(Subcategory=chart["filter"]['Subcategory'])
     # st.write("Filtered data:", scope)  # Check filtered data
 
     fig = px.line(
@@ -26,7 +41,7 @@ def create_chart_line(df, chart):
         color="Company",
         markers=True,
         title=chart["title"],
-        color_discrete_sequence=px.colors.qualitative.Plotly
+        **company_style(df)
     )
     return fig
     #st.plotly_chart(fig, use_container_width=True)
@@ -36,13 +51,13 @@ def create_chart_line(df, chart):
 
     
 def create_chart_bar(df, chart):
-    scope = df
-    if chart['filter'].get('Category'):
-        scope = df[(df["Category"] == chart["filter"]['Category'])]
+    # a Subcategory filter takes precedence over Category; Year narrows either
+    filters = {"Year": chart["filter"].get('Year') or None}
     if chart['filter'].get('Subcategory'):
-        scope = df[(df["Subcategory"] == chart["filter"]['Subcategory'])]
-    if chart["filter"].get('Year'):
-        scope = scope[scope["Year"] == chart["filter"]['Year']]
+        filters["Subcategory"] = chart["filter"]['Subcategory']
+    elif chart['filter'].get('Category'):
+        filters["Category"] = chart["filter"]['Category']
+    scope = get_cube(df).select(**filters)
 
     
 
@@ -54,8 +69,11 @@ def create_chart_bar(df, chart):
         color="Company",
         title=chart["title"],
         text_auto=True,
-        color_discrete_sequence=px.colors.qualitative.Plotly
-    ).update_traces(width=0.3).update_layout(bargap=0.2, bargroupgap=0.1)
+        **company_style(df)
+    ).update_layout(bargap=0.2, bargroupgap=0.1)
+    if len(get_cube(df).companies) <= 2:
+        # thin bars for a pair; with more companies plotly's grouping has to share the width
+        fig.update_traces(width=0.3)
     return fig
     # st.plotly_chart(fig, use_container_width=True)
     # if show_df:
@@ -63,7 +81,7 @@ def create_chart_bar(df, chart):
     #         st.write(scope)
 
 def creat_chart_pie(df, chart):
-    scope = df[df["Subcategory"] == chart["filter"]['Subcategory']]
+    scope = get_cube(df).select(Subcategory=chart["filter"]['Subcategory'])
 
 
 
@@ -106,6 +124,15 @@ def render_charts(chart_json_str, df, analysis=False):
                 st.plotly_chart(fig, use_container_width=True)
 
 
+def render_figs(fig_array, cols_per_row=2):
+    # lays out figures that were already built (e.g. by get_charts_fig) in the same grid as render_charts
+    for row_start in range(0, len(fig_array), cols_per_row):
+        cols = st.columns(cols_per_row)
+        for i, fig in enumerate(fig_array[row_start: row_start + cols_per_row]):
+            with cols[i]:
+                st.plotly_chart(fig, use_container_width=True)
+
+
 def get_charts_fig(charts_arr, df):
     fig_array = []
 
@@ -1,13 +1,35 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
-from pathlib import Path
+
+from ai_visualization.catalog import get_catalog
+from ai_visualization.data_store import get_data_store
+from ai_visualization.derived_metrics import key_metrics_summary
+
+# files read at the same time by load_companies; parsing is mostly I/O and C code outside the GIL
+LOAD_WORKERS = int(os.getenv("DATA_LOAD_WORKERS", 8))
 
 def load_company_data(company_name: str):
-    data_dir = Path("data")
-    for ext in ["xlsx", "csv"]:
-        file_path = data_dir / f"{company_name.lower()}.{ext}"
-        if file_path.exists():
-            if ext == "xlsx":
-                return pd.read_excel(file_path)
-            else:
-                return pd.read_csv(file_path)
-    raise FileNotFoundError(f"No data found for {company_name}")
+    # the catalogue knows which file holds the company; the store parses it once and caches it
+    entry = get_catalog().get(company_name)
+    if entry is None:
+        raise FileNotFoundError(f"No data found for {company_name}")
+    # parent totals filled and key metrics (growth, margins, YoY) appended, computed once per file
+    return get_data_store().load_file(entry.path, derived=True)
+
+def load_companies(company_names, max_workers: int = LOAD_WORKERS):
+    """Every company's data in one frame, with a categorical Company column in the order given."""
+    company_names = list(dict.fromkeys(company_names))
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(company_names)))) as pool:
+        frames = list(pool.map(load_company_data, company_names))
+    for name, df in zip(company_names, frames):
+        df["Company"] = name
+    combined_df = pd.concat(frames, ignore_index=True)
+    # a fixed category order keeps every chart's series and colours in the same order
+    combined_df["Company"] = pd.Categorical(combined_df["Company"], categories=company_names)
+    return combined_df
+
+def load_key_metrics(company_name: str, years: int = 3):
+    # the latest years' key metrics, small enough to hand to the agents
+    return key_metrics_summary(load_company_data(company_name), years)
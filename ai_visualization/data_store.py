@@ -0,0 +1,190 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+from ai_analysis.shared import process_singleton
+from ai_visualization.derived_metrics import with_derived_metrics
+
+try:
+    import pyarrow  # noqa: F401  (pandas' Parquet engine)
+except ImportError:  # without pyarrow the cache is written as pickles; loads are still parsed only once
+    pyarrow = None
+
+DATA_CACHE_DIR = os.getenv("DATA_CACHE_DIR", ".cache/data")
+# bump when parsing changes, so caches written by older code are rebuilt
+CACHE_VERSION = 1
+# bump when derived_metrics changes, so derived caches are recomputed
+DERIVED_CACHE_VERSION = 1
+
+
+def _file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_atomic(path: Path, write):
+    # a half-written cache file must never be read back as valid
+    tmp = path.with_name(path.name + ".tmp")
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def _read_meta(meta_path: Path, version: int) -> dict | None:
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get("version") == version else None
+
+
+def _read_frame(data_path: Path, cache_format: str) -> pd.DataFrame | None:
+    try:
+        return pd.read_parquet(data_path) if cache_format == "parquet" else pd.read_pickle(data_path)
+    except Exception:
+        return None  # a damaged cache is rebuilt from the source
+
+
+class CompanyDataStore:
+    """Company financials parsed once per source file, cached on disk as Parquet and in memory per process."""
+
+    def __init__(self, cache_dir: str | Path = DATA_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self._lock = threading.Lock()
+        self._file_locks: dict[Path, threading.Lock] = {}
+        self._frames: dict[Path, tuple[tuple, pd.DataFrame, str | None]] = {}
+        self._derived: dict[Path, tuple[pd.DataFrame, pd.DataFrame]] = {}
+        self.stats = {"memory": 0, "cache": 0, "parsed": 0, "derived_cache": 0, "derived": 0}
+
+    def load_file(self, source: str | Path, derived: bool = False) -> pd.DataFrame:
+        """The parsed contents of `source`; a copy, so callers may add columns.
+
+        With `derived`, parent totals are filled and key metrics appended (see
+        derived_metrics.with_derived_metrics).
+        """
+        source = Path(source)
+        df, sha256 = self._load(source)
+        if derived:
+            df = self._load_derived(source, df, sha256)
+        return df.copy()
+
+    def _file_lock(self, source: Path) -> threading.Lock:
+        with self._lock:
+            return self._file_locks.setdefault(source, threading.Lock())
+
+    def _load(self, source: Path) -> tuple[pd.DataFrame, str | None]:
+        # one parse per file even when several sessions ask for it at once
+        with self._file_lock(source):
+            stat = source.stat()
+            signature = (stat.st_mtime_ns, stat.st_size)
+            cached = self._frames.get(source)
+            if cached is not None and cached[0] == signature:
+                self._count("memory")
+                return cached[1], cached[2]
+            df, sha256 = self._read_cache(source, signature)
+            if df is None:
+                df = self._parse(source)
+                sha256 = self._write_cache(source, signature, df)
+            self._frames[source] = (signature, df, sha256)
+            return df, sha256
+
+    def _load_derived(self, source: Path, df: pd.DataFrame, sha256: str | None) -> pd.DataFrame:
+        with self._file_lock(source):
+            cached = self._derived.get(source)
+            # keyed by the parsed frame, so a re-parsed file gets its metrics computed again
+            if cached is not None and cached[0] is df:
+                return cached[1]
+            enriched = self._read_derived(source, sha256)
+            if enriched is None:
+                self._count("derived")
+                enriched = with_derived_metrics(df)
+                self._write_derived(source, sha256, enriched)
+            self._derived[source] = (df, enriched)
+            return enriched
+
+    def _cache_paths(self, source: Path, kind: str = "") -> tuple[Path, Path]:
+        stem = self.cache_dir / f"{source.stem}.{source.suffix.lstrip('.')}{kind}"
+        return stem.with_name(stem.name + ".json"), stem.with_name(stem.name + ".data")
+
+    def _read_cache(self, source: Path, signature: tuple) -> tuple[pd.DataFrame | None, str | None]:
+        meta_path, data_path = self._cache_paths(source)
+        meta = _read_meta(meta_path, CACHE_VERSION)
+        if meta is None:
+            return None, None
+        if tuple(meta["signature"]) != signature:
+            # touched or copied, not necessarily edited: the content decides
+            if meta["sha256"] != _file_hash(source):
+                return None, None
+            meta["signature"] = list(signature)
+            _write_atomic(meta_path, lambda tmp: tmp.write_text(json.dumps(meta), encoding="utf-8"))
+        df = _read_frame(data_path, meta["format"])
+        if df is None:
+            return None, None
+        self._count("cache")
+        return df, meta["sha256"]
+
+    def _read_derived(self, source: Path, sha256: str | None) -> pd.DataFrame | None:
+        if sha256 is None:
+            return None
+        meta_path, data_path = self._cache_paths(source, ".derived")
+        meta = _read_meta(meta_path, DERIVED_CACHE_VERSION)
+        if meta is None or meta["sha256"] != sha256:
+            return None
+        df = _read_frame(data_path, meta["format"])
+        if df is not None:
+            self._count("derived_cache")
+        return df
+
+    def _parse(self, source: Path) -> pd.DataFrame:
+        self._count("parsed")
+        if source.suffix == ".xlsx":
+            return pd.read_excel(source)
+        return pd.read_csv(source)
+
+    def _write_cache(self, source: Path, signature: tuple, df: pd.DataFrame) -> str | None:
+        # the source's SHA-256 once its cache is written; None if it could not be
+        meta_path, data_path = self._cache_paths(source)
+        sha256 = _file_hash(source)
+        meta = {"version": CACHE_VERSION, "signature": list(signature), "sha256": sha256}
+        return sha256 if self._write_frame(meta_path, data_path, meta, df) else None
+
+    def _write_derived(self, source: Path, sha256: str | None, df: pd.DataFrame):
+        if sha256 is not None:
+            meta_path, data_path = self._cache_paths(source, ".derived")
+            self._write_frame(meta_path, data_path, {"version": DERIVED_CACHE_VERSION, "sha256": sha256}, df)
+
+    def _write_frame(self, meta_path: Path, data_path: Path, meta: dict, df: pd.DataFrame) -> bool:
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            return False
+        cache_format = "pickle"
+        if pyarrow is not None:
+            try:
+                _write_atomic(data_path, lambda tmp: df.to_parquet(tmp, index=True))
+                cache_format = "parquet"
+            except Exception:
+                pass  # e.g. an object column mixing numbers and text
+        try:
+            if cache_format == "pickle":
+                _write_atomic(data_path, df.to_pickle)
+            meta = {**meta, "format": cache_format}
+            _write_atomic(meta_path, lambda tmp: tmp.write_text(json.dumps(meta), encoding="utf-8"))
+        except OSError:
+            return False  # a read-only cache directory only costs the next process a parse
+        return True
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+
+@process_singleton
+def get_data_store() -> CompanyDataStore:
+    return CompanyDataStore()
@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+
+# rows that are ratios of other rows; they are never summed into a parent
+RATIO_PATTERN = r"%|margin|growth"
+# standard statement lines and the subcategory names companies file them under (first one found wins)
+BASE_METRICS = {
+    "Revenue": ("Total Revenue", "Revenue", "Revenues"),
+    "COGS": ("Total COGS", "COGS"),
+    "Gross Profit": ("Gross Profit",),
+    "EBITDA": ("Operating Profit (EBITDA)",),
+    "EBIT": ("Profit Before Income Taxes (EBIT)", "Profit Before Income Tax (EBIT)"),
+    "Net Income": ("Net Income",),
+    "EPS": ("EPS",),
+}
+# derived rows of the statements and the key metric they report; the reported figure wins where there is one
+FILLED_ROWS = {
+    "Total Revenue Growth%": "Revenue Growth%",
+    "Gross Profit Margin%": "Gross Margin%",
+    "Op. Margin%": "EBITDA Margin%",
+    "EBIT Margin%": "EBIT Margin%",
+    "Net Income Margin%": "Net Margin%",
+    "Net Income Margin": "Net Margin%",
+    "EPS Growth": "EPS Growth%",
+}
+KEY_METRICS_CATEGORY = "Key Metrics"
+
+
+def _parent_flags(column: pd.Series) -> pd.Series:
+    if column.dtype == bool:
+        return column
+    # from text files the flag can arrive as "true"/"false"
+    return column.astype(str).str.strip().str.casefold().isin(("true", "1", "yes"))
+
+
+def fill_parent_totals(df: pd.DataFrame) -> pd.DataFrame:
+    """Values for empty parent rows (IsParent true, Value NaN), from the rows under them.
+
+    A parent's children are the rows that follow it, up to the next parent, in
+    the same company and year; ratio rows are skipped. A child filed under the
+    parent's own name (iberry's COGS) is its value, otherwise the children are
+    summed. Parents with no numeric children stay empty.
+    """
+    frame = df.reset_index(drop=True).copy()
+    value = pd.to_numeric(frame["Value"], errors="coerce")
+    parent = _parent_flags(frame["IsParent"])
+    keys = [column for column in ("Company", "Year") if column in frame]
+    block = frame.groupby(keys, sort=False, observed=True).ngroup()
+    section = parent.groupby(block).cumsum()
+    subcategory = frame["Subcategory"].astype(str)
+    child = ~parent & ~subcategory.str.contains(RATIO_PATTERN, case=False, regex=True)
+    groups = [block, section]
+    parent_name = subcategory.where(parent).groupby(groups).transform("first")
+    children = value.where(child).groupby(groups)
+    summed = children.transform("sum").where(children.transform("count") > 0)
+    named = value.where(child & (subcategory == parent_name)).groupby(groups).transform("first")
+    total = named.fillna(summed)
+    frame["Value"] = value.mask(parent & value.isna() & (section > 0), total)
+    return frame
+
+
+def _base_table(frame: pd.DataFrame, keys: list) -> pd.DataFrame:
+    # one row per company-year, one column per BASE_METRICS line
+    wide = frame.groupby(keys + ["Subcategory"], observed=True)["Value"].first().unstack("Subcategory")
+    base = pd.DataFrame(index=wide.index)
+    for metric, names in BASE_METRICS.items():
+        columns = [name for name in names if name in wide.columns]
+        base[metric] = wide[columns].bfill(axis=1).iloc[:, 0] if columns else np.nan
+    return base.sort_index()
+
+
+def key_metrics(frame: pd.DataFrame) -> pd.DataFrame:
+    """Growth rates, margins (as fractions, like the statements) and YoY deltas per company and year.
+
+    `frame` is long-format with parent totals filled; the result is indexed like
+    it by (Company,) Year with one column per metric. Growth follows the
+    statements: current / previous year - 1, so a smaller loss is negative growth.
+    Computed from the rounded per-share figures the files carry, EPS growth can
+    differ from the reported "EPS Growth" row, which with_derived_metrics prefers.
+    """
+    keys = [column for column in ("Company", "Year") if column in frame]
+    base = _base_table(frame, keys)
+    previous = base.groupby(level="Company").shift() if "Company" in keys else base.shift()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        revenue = base["Revenue"].where(base["Revenue"] != 0)
+        metrics = pd.DataFrame({
+            "Revenue Growth%": base["Revenue"] / previous["Revenue"] - 1,
+            "Gross Margin%": base["Gross Profit"] / revenue,
+            "EBITDA Margin%": base["EBITDA"] / revenue,
+            "EBIT Margin%": base["EBIT"] / revenue,
+            "Net Margin%": base["Net Income"] / revenue,
+            "Net Income Growth%": base["Net Income"] / previous["Net Income"] - 1,
+            "EPS Growth%": base["EPS"] / previous["EPS"] - 1,
+        }, index=base.index)
+    for metric in BASE_METRICS:
+        metrics[f"{metric} YoY"] = base[metric] - previous[metric]
+    return metrics.replace([np.inf, -np.inf], np.nan)
+
+
+def with_derived_metrics(df: pd.DataFrame) -> pd.DataFrame:
+    """`df` with parent totals filled, empty derived rows computed and a "Key Metrics" row per metric and year.
+
+    Works on one company's statements or on several stacked with a Company
+    column, in one pass over all companies and years. A key metric the
+    statement reports itself (see FILLED_ROWS) takes the reported figure.
+    """
+    frame = fill_parent_totals(df)
+    keys = [column for column in ("Company", "Year") if column in frame]
+    metrics = key_metrics(frame)
+    long = metrics.stack(future_stack=True).rename("Value").reset_index()
+    long = long.rename(columns={long.columns[len(keys)]: "Subcategory"})
+
+    wanted = frame["Subcategory"].map(FILLED_ROWS)
+    # the statements' own growth and margin figures replace the computed ones, e.g. EPS growth from unrounded EPS
+    reported = frame.loc[wanted.notna() & frame["Value"].notna(), keys + ["Value"]].assign(Subcategory=wanted)
+    reported = reported.groupby(keys + ["Subcategory"], observed=True)["Value"].first()
+    metric_index = pd.MultiIndex.from_frame(long[keys + ["Subcategory"]])
+    long["Value"] = reported.reindex(metric_index).fillna(long.set_index(keys + ["Subcategory"])["Value"]).to_numpy()
+
+    # the statements' own growth and margin rows, where they were left empty
+    lookup = long.set_index(keys + ["Subcategory"])["Value"]
+    rows = frame.loc[wanted.notna() & frame["Value"].isna()]
+    if not rows.empty:
+        index = pd.MultiIndex.from_frame(rows[keys].assign(Subcategory=wanted[rows.index]))
+        frame.loc[rows.index, "Value"] = lookup.reindex(index).to_numpy()
+
+    long = long.dropna(subset=["Value"])
+    long["Category"] = KEY_METRICS_CATEGORY
+    long["IsParent"] = False
+    if "index" in frame:
+        long["index"] = np.arange(len(long)) + (int(frame["index"].max()) + 1 if len(frame) else 0)
+    return pd.concat([frame, long[[column for column in frame.columns if column in long]]], ignore_index=True)
+
+
+def key_metrics_summary(df: pd.DataFrame, years: int = 3) -> dict:
+    """The latest `years` of key metrics as {year: {metric: value}}, rounded, for agent prompts."""
+    rows = df[df["Category"] == KEY_METRICS_CATEGORY]
+    table = rows.pivot_table(index="Year", columns="Subcategory", values="Value", aggfunc="first").sort_index()
+    return {
+        str(year): {metric: round(float(value), 4) for metric, value in values.dropna().items()}
+        for year, values in table.tail(years).iterrows()
+    }
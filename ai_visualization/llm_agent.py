@@ -1,11 +1,23 @@
 from langchain.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
 
+import json
 import os
+import time
+
+from ai_analysis import telemetry
+from ai_analysis.llm_cache import cached_invoke
+from ai_analysis.llm_pool import get_llm
+from ai_analysis.model_router import configured_latency_budget, get_router
+from ai_visualization.chart_generator import clean_json_output
 
 api_key = os.getenv("OPEN_API_KEY")
 
-llm = ChatOpenAI(model="gpt-4o-2024-05-13", temperature=0, openai_api_key=api_key)
+MODEL = "gpt-4o-2024-05-13"
+# picking columns and chart types from the data summary needs the standard tier (see model_router)
+QUALITY_TIER = 2
+LATENCY_BUDGET = configured_latency_budget("ChartPlanner", 20)
+# rows of the combined data shown to the planner, shared evenly between the companies
+SAMPLE_ROWS = 50
 
 template = """
 You are a financial analyst. Analyze the following dataset for {company}:
@@ -26,20 +38,22 @@ prompt = PromptTemplate(
     template=template
 )
 
-def analyze_two_companies(company_names, df):
-    # Convert DataFrame to CSV for AI context
-    csv_sample = df.head(50).to_csv(index=False)  
+def analyze_companies(company_names, df, use_cache=True):
+    # Convert DataFrame to CSV for AI context; every company gets rows in the sample, not just the first
+    per_company = max(1, SAMPLE_ROWS // len(company_names))
+    csv_sample = df.groupby("Company", observed=True, sort=False).head(per_company).to_csv(index=False)
     df_summary = summarize_df(df)
+    names = ", ".join(company_names[:-1]) + f" and {company_names[-1]}" if len(company_names) > 1 else company_names[0]
 
     prompt = f"""
-You are a financial analyst. Analyze the following dataset for {company_names[0]} and {company_names[1]}:
+You are a financial analyst. Analyze the following dataset for {names}:
 
 {df_summary}
 
 You are a data visualization expert.
-We have data from TWO companies: {company_names[0]} and {company_names[1]}.
+We have data from {len(company_names)} companies: {names}.
 The column 'Company' identifies which row belongs to which company.
-Generate JSON describing charts that COMPARE these two companies in the same figure where possible.
+Generate JSON describing charts that COMPARE these companies in the same figure where possible.
 
 Suggest a set of visualizations that would best represent the data.
 
@@ -52,7 +66,8 @@ Rules:
 - Give atleast 5 different charts if possible, Try to use as many different chart types as you can.
 - Always include summary analysis in the form of {{type: "analysis", title: "<title>", value: "<summary>"}} at the end
 - Pick x, y axis and filter from the dataset columns, do not create new columns.
-- Bar Chart should specify a specific year after 2018, also try to pick X axis that is both relevant to both companies.
+- Prefer the "Key Metrics" rows (growth and margins) when comparing companies of different sizes.
+- Bar Chart should specify a specific year after 2018, also try to pick X axis that is relevant to all companies.
 
 Here is the summary of dataset:
 {df_summary}
@@ -60,10 +75,25 @@ Here is a sample of the combined dataset:
 {csv_sample}
 """
 
-    response = llm.invoke(prompt)  # Your LangChain/OpenAI call
+    llm = get_llm(MODEL, 0, api_key)
+    started = time.perf_counter()
+    response, cache_status, llm = get_router().call(
+        "Chart Planner", llm, QUALITY_TIER, LATENCY_BUDGET,
+        lambda llm: cached_invoke(llm, prompt, use_cache, agent="Chart Planner", valid=is_chart_plan),
+        is_chart_plan,
+    )
+    telemetry.record_call("Chart Planner", llm.model_name, started, response=response, cache=cache_status)
     return response.content
 
 
+def is_chart_plan(content):
+    # the page and the report both load the plan as a JSON list; anything else is retried on a larger model
+    try:
+        return isinstance(json.loads(clean_json_output(content)), list)
+    except ValueError:
+        return False
+
+
 
 def summarize_df(df):
     summary = {
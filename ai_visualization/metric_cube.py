@@ -0,0 +1,122 @@
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+# the long-format columns a slice can be selected on
+DIMENSIONS = ("Company", "Category", "Subcategory", "Year")
+CATEGORICAL = ("Company", "Category", "Subcategory")
+
+
+class MetricCube:
+    """Long-format financials (Company, Category, Subcategory, IsParent, Year, Value) indexed for slicing."""
+
+    def __init__(self, df: pd.DataFrame):
+        frame = df.reset_index(drop=True)
+        frame = frame.astype({column: "category" for column in CATEGORICAL if column in frame})
+        if "Value" in frame:
+            frame["Value"] = pd.to_numeric(frame["Value"], errors="coerce")
+        self.frame = frame
+        # row positions per dimension value: a selection is a few dictionary reads and an intersection, not a mask
+        self._positions = {
+            column: frame.groupby(column, observed=True, sort=False).indices
+            for column in DIMENSIONS if column in frame
+        }
+        self._lock = threading.Lock()
+        self._slices: dict[tuple, pd.DataFrame] = {}
+        self._pivots: dict[str, pd.DataFrame] = {}
+
+    @property
+    def companies(self) -> list:
+        return list(self._positions.get("Company", ()))
+
+    @property
+    def years(self) -> list:
+        return sorted(pd.Index(list(self._positions.get("Year", ()))).tolist())
+
+    def _rows(self, column: str, value) -> np.ndarray:
+        positions = self._positions.get(column, {})
+        rows = positions.get(value)
+        if rows is None and column == "Year":
+            # chart plans written by the LLM give years as text as often as numbers
+            try:
+                rows = positions.get(int(value))
+            except (TypeError, ValueError):
+                pass
+        return rows if rows is not None else np.empty(0, dtype=np.intp)
+
+    def select(self, **filters) -> pd.DataFrame:
+        """Rows matching every filter, e.g. select(Subcategory="Revenues", Year=2022); shared, do not modify."""
+        filters = {column: value for column, value in filters.items() if value is not None}
+        unknown = set(filters) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"cannot select on {', '.join(sorted(unknown))}")
+        key = tuple(sorted(filters.items(), key=lambda item: item[0]))
+        with self._lock:
+            scope = self._slices.get(key)
+        if scope is not None:
+            return scope
+        if filters:
+            matches = sorted((self._rows(column, value) for column, value in filters.items()), key=len)
+            rows = matches[0]
+            for other in matches[1:]:
+                rows = np.intersect1d(rows, other, assume_unique=True)
+            scope = self.frame.iloc[np.sort(rows)]
+        else:
+            scope = self.frame
+        with self._lock:
+            self._slices[key] = scope
+        return scope
+
+    def pivot(self, company: str) -> pd.DataFrame:
+        """The company's values with years as rows and (Category, Subcategory) as columns; KeyError if unknown."""
+        with self._lock:
+            table = self._pivots.get(company)
+        if table is None:
+            rows = self.select(Company=company)
+            if rows.empty:
+                raise KeyError(company)
+            # a repeated metric (e.g. a parent row with no value next to its child) keeps its first value
+            values = rows.groupby(["Year", "Category", "Subcategory"], observed=True)["Value"].first()
+            table = values.unstack(["Category", "Subcategory"])
+            with self._lock:
+                self._pivots[company] = table
+        return table
+
+    def value(self, company: str, category: str, subcategory: str, year: int) -> float:
+        try:
+            return self.pivot(company).at[year, (category, subcategory)]
+        except KeyError:
+            return np.nan
+
+
+_cubes: dict[int, tuple[weakref.ref, MetricCube]] = {}
+_cubes_lock = threading.Lock()
+
+
+def get_cube(df: pd.DataFrame) -> MetricCube:
+    """The cube of `df`, built on first use and kept while the frame is alive.
+
+    Keyed by the frame object, so a frame must not be modified once charts were
+    drawn from it; the pages and the pipeline only ever build new ones.
+    """
+    if isinstance(df, MetricCube):
+        return df
+    key = id(df)
+    with _cubes_lock:
+        entry = _cubes.get(key)
+        if entry is not None and entry[0]() is df:
+            return entry[1]
+    cube = MetricCube(df)
+    with _cubes_lock:
+        _cubes[key] = (weakref.ref(df, lambda ref: _forget(key, ref)), cube)
+    return cube
+
+
+def _forget(key: int, ref: weakref.ref):
+    # called by the garbage collector, possibly while this thread holds _cubes_lock, so it takes no lock;
+    # the id may already belong to a newer frame, whose entry is kept (at worst its cube is rebuilt)
+    entry = _cubes.get(key)
+    if entry is not None and entry[0] is ref:
+        _cubes.pop(key, None)
@@ -0,0 +1,140 @@
+"""Offline benchmark of the M&A comparison flow on the fake LLM backend.
+
+    python benchmarks/bench_pipeline.py --repeat 5
+    python benchmarks/bench_pipeline.py --save baseline.json
+    python benchmarks/bench_pipeline.py --compare baseline.json --tolerance 0.2
+
+Times every agent node, the chart planner, get_charts_fig, section formatting and
+ReportGenerator, plus the whole flow with a cold and a warm response cache. LLM
+latency is simulated (see ai_analysis/fake_llm.py), so the numbers measure our
+orchestration, caching and rendering code and are repeatable between runs.
+With --compare, stages that got slower than the baseline by more than the
+tolerance are listed and the exit code is 1.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+# must be set before the ai_analysis modules read them
+os.environ["LLM_BACKEND"] = "fake"
+os.environ.setdefault("OPEN_API_KEY", "offline")
+os.environ.setdefault("LLM_CACHE_PATH", str(Path(tempfile.mkdtemp(prefix="bench-")) / "llm_cache.sqlite"))
+sys.path.insert(0, str(ROOT))
+# the company data is read from data/ relative to the working directory
+os.chdir(ROOT)
+
+from ai_analysis import telemetry  # noqa: E402
+from ai_analysis.Agent.registry import build_agent_registry  # noqa: E402
+from ai_analysis.llm_cache import get_cache  # noqa: E402
+from ai_analysis.pipeline import (  # noqa: E402
+    analysis_outputs, build_analysis_graph, build_report, format_sections,
+)
+from ai_visualization.chart_generator import get_charts_analysis, get_charts_fig, read_charts  # noqa: E402
+
+try:
+    import kaleido  # noqa: F401
+    CHART_IMAGES = True
+except ImportError:  # the report is then timed without its chart images
+    CHART_IMAGES = False
+
+
+def timed(timings: dict, stage: str, fn, *args, **kwargs):
+    started = time.perf_counter()
+    value = fn(*args, **kwargs)
+    timings.setdefault(stage, []).append(time.perf_counter() - started)
+    return value
+
+
+def run_flow(agents: dict, co1: str, co2: str, polish: bool, timings: dict, prefix: str):
+    """One full comparison, as the page runs it; per-stage times go into `timings`."""
+    started = time.perf_counter()
+    node_started = {}
+
+    def on_status(name, state, value):
+        if state == "running":
+            node_started[name] = time.perf_counter()
+        elif state == "complete":
+            timings.setdefault(f"{prefix}node:{name}", []).append(time.perf_counter() - node_started[name])
+
+    graph = build_analysis_graph(agents, co1, "", co2, "")
+    outputs = analysis_outputs(timed(timings, f"{prefix}agent_graph", graph.run, on_status=on_status))
+    formatter = agents["formatter_polish" if polish else "formatter"]
+    section_html = timed(timings, f"{prefix}format_sections", format_sections, formatter, outputs)
+    charts_arr = read_charts(outputs["chart_plan"])
+    chart_figs = timed(timings, f"{prefix}get_charts_fig", get_charts_fig, charts_arr, outputs["df"])
+    report = build_report(section_html, chart_figs if CHART_IMAGES else [], get_charts_analysis(charts_arr))
+    timed(timings, f"{prefix}report_html", report.buildReportHTML)
+    timings.setdefault(f"{prefix}end_to_end", []).append(time.perf_counter() - started)
+
+
+def summarize(timings: dict) -> dict:
+    return {
+        stage: {
+            "median_s": statistics.median(values),
+            "min_s": min(values),
+            "max_s": max(values),
+            "runs": len(values),
+        }
+        for stage, values in sorted(timings.items())
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for stage, stats in results.items():
+        before = baseline.get(stage)
+        # sub-millisecond stages are too noisy to compare
+        if before and before["median_s"] > 0.001 and stats["median_s"] > before["median_s"] * (1 + tolerance):
+            regressions.append(f"{stage}: {before['median_s']:.3f}s -> {stats['median_s']:.3f}s")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--buyer", default="Centel")
+    parser.add_argument("--target", default="iberry")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--polish", action="store_true", help="format sections with the (fake) LLM")
+    parser.add_argument("--save", type=Path, help="write the results as JSON")
+    parser.add_argument("--compare", type=Path, help="baseline JSON written by --save")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    agents = build_agent_registry(os.environ["OPEN_API_KEY"])
+    cache = get_cache()
+    timings = {}
+    run = telemetry.RunTelemetry(trace_dir=None)
+    with telemetry.activate(run):
+        for _ in range(args.repeat):
+            cache.clear()
+            run_flow(agents, args.buyer, args.target, args.polish, timings, "cold:")
+            run_flow(agents, args.buyer, args.target, args.polish, timings, "warm:")
+
+    results = summarize(timings)
+    width = max(map(len, results))
+    print(f"{'stage':<{width}}  median_s   min_s   max_s")
+    for stage, stats in results.items():
+        print(f"{stage:<{width}}  {stats['median_s']:8.3f} {stats['min_s']:7.3f} {stats['max_s']:7.3f}")
+    if not CHART_IMAGES:
+        print("kaleido is not installed: report_html was timed without chart images")
+    print(f"{len(run.records)} LLM calls, settings: latency={os.getenv('FAKE_LLM_LATENCY', '0.5')}s "
+          f"jitter={os.getenv('FAKE_LLM_JITTER', '0.1')}s tokens/s={os.getenv('FAKE_LLM_TOKENS_PER_SECOND', '80')}")
+
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if args.compare:
+        regressions = compare(results, json.loads(args.compare.read_text(encoding="utf-8")), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
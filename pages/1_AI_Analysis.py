@@ -1,21 +1,19 @@
 import os
-import re
-import time
-import pandas as pd
+import uuid
 import streamlit as st
-import json
 
 
-from ai_analysis import generate_report
-from ai_analysis.Agent.MarkdownAgent import HTMLAgent
-from ai_analysis.Agent.CompanyInformationAgent import CompanyInformationAgent
-from ai_analysis.Agent.StrategyAgent import StrategyAgent
-from ai_analysis.Agent.ValuationAgent import ValuationAgent
-from ai_analysis.Agent.DueDiligenceAgent import DueDiligenceAgent
-from ai_analysis.filechecker import company_file_exists
-from ai_visualization.chart_generator import get_charts_analysis, get_charts_fig, read_charts, render_charts
-from ai_visualization.data_loader import load_company_data
-from ai_visualization.llm_agent import analyze_two_companies
+from ai_analysis import rate_limiter, telemetry
+from ai_analysis.jobs import FINISHED, get_job_queue, load_outputs
+from ai_analysis.artifacts import ArtifactStore, fingerprint
+from ai_analysis.model_router import get_router
+from ai_analysis.pipeline import build_charts, build_report, clean_json_output, has_financial_reports, profile_input
+from ai_analysis.prefetch import get_prefetcher
+from ai_analysis.profile_store import get_profile_store
+from ai_analysis.singleflight import get_single_flight
+from ai_visualization.catalog import get_catalog
+from ai_analysis.Agent.registry import build_agent_registry
+from ai_visualization.chart_generator import render_figs
 
 api_key = os.getenv("OPEN_API_KEY")
 
@@ -34,47 +32,110 @@ st.write("Ask AI to do a pre-screening report on target company.")
 def reset_flow():
     st.session_state.stage = "input"
 
+def start_over():
+    reset_flow()
+    st.session_state.pop("job_id", None)
+    st.query_params.pop("job", None)
+
 def ensure_keys():
     st.session_state.setdefault("stage", "input")
     st.session_state.setdefault("co1", "Centel")
     st.session_state.setdefault("co2", "iberry")
     st.session_state.setdefault("co1_info", "")
     st.session_state.setdefault("co2_info", "")
+    # the rate limiter queues LLM calls fairly between sessions
+    st.session_state.setdefault("session_id", uuid.uuid4().hex)
 
 if "stage" not in st.session_state:
     reset_flow()  
 ensure_keys()
 
-AGENT_REGISTRY = {
-    "company_info_buyer": CompanyInformationAgent(api_key, "buyer"),
-    "company_info_target": CompanyInformationAgent(api_key, "target"),
-    "strategy": StrategyAgent(api_key),
-    "valuation": ValuationAgent(api_key),
-    "due_diligence": DueDiligenceAgent(api_key),
-    "formatter": HTMLAgent(api_key)
-}
-def clean_json_output(llm_output: str):
-    cleaned = re.sub(r"^```(?:json)?|```$", "", llm_output.strip(), flags=re.MULTILINE)
-    return cleaned.strip()
+@st.cache_resource(show_spinner=False)
+def get_agent_registry(api_key):
+    # built once per process; every session and rerun shares the agents and their LLM clients
+    return build_agent_registry(api_key)
+
+AGENT_REGISTRY = get_agent_registry(api_key)
+PREFETCHER = get_prefetcher()
+JOB_QUEUE = get_job_queue(AGENT_REGISTRY)
+JOB_STORE = JOB_QUEUE.store
+PROFILE_STORE = get_profile_store()
+CATALOG = get_catalog()
+# profile agent -> the (name, description) widgets that make up its input
+PROFILE_SLOTS = {"company_info_buyer": ("co1", "co1_info"), "company_info_target": ("co2", "co2_info")}
+
+STREAM_PREVIEW_CHARS = 1200
+# how often the running stage reads a job's progress back from the job store
+JOB_POLL_SECONDS = 0.5
+
+# a reloaded page has lost its session state; the job ID in the URL brings it back to its run
+if st.session_state.stage == "input" and "job" in st.query_params and "job_id" not in st.session_state:
+    job = JOB_STORE.get(st.query_params["job"])
+    if job is not None:
+        st.session_state.job_id = job["job_id"]
+        st.session_state.run_inputs = job["inputs"]
+        st.session_state.stage = "running"
+    else:
+        st.query_params.pop("job", None)
+
+
+def profile_slot_input(slot):
+    name_key, info_key = PROFILE_SLOTS[slot]
+    return profile_input(st.session_state.get(name_key, ""), st.session_state.get(info_key, ""))
+
+
+def schedule_prefetch(*slots):
+    # opt-in: start the profile agents while the user is still on the form
+    if not st.session_state.get("prefetch_profiles"):
+        return
+    for slot in slots or PROFILE_SLOTS:
+        json_input = profile_slot_input(slot)
+        if json_input["company_name"].strip():
+            PREFETCHER.schedule(slot, AGENT_REGISTRY[slot], json_input, st.session_state.session_id)
+
+
+def start_job(run_inputs, prefetched=None):
+    # the analysis runs on the job queue's workers; this session only follows its progress
+    st.session_state.run_inputs = run_inputs
+    st.session_state.job_id = JOB_QUEUE.submit(run_inputs, st.session_state.session_id, prefetched)
+    st.query_params["job"] = st.session_state.job_id
+    st.session_state.stage = "running"
 
 
 #stage: user input
 if st.session_state.stage =="input":
+    notice = st.session_state.pop("job_notice", None)
+    if notice:
+        st.warning(notice)
     with st.container(border=True):
         st.subheader("Choose Companies")
         c1,c2,c3 = st.columns([3,3,1])
         with c1:
-            company_1 = st.text_input("Enter first company name", key="co1")
+            company_1 = st.text_input("Enter first company name", key="co1",
+                                      on_change=schedule_prefetch, args=("company_info_buyer",))
         with c2:
-            company_2 = st.text_input("Enter second company name", key="co2")
+            company_2 = st.text_input("Enter second company name", key="co2",
+                                      on_change=schedule_prefetch, args=("company_info_target",))
         with c3:
             st.write("")
             st.write("")
             company_clicked = st.button("Compare", use_container_width=True)
+        # charts need financial reports for both companies; say up front which ones have them
+        for name in (company_1, company_2):
+            metadata = CATALOG.metadata(name) if name.strip() else None
+            if metadata is not None and metadata["years"]:
+                first, last = metadata["years"]
+                st.caption(f"📁 {name}: financial reports {first}–{last} ({metadata['rows']} rows)")
+            elif name.strip():
+                st.caption(f"📁 {name}: no financial reports in the database, charts will be skipped")
         st.write("Optional:")
         with st.expander("Additional Information"):
-            company_1_info = st.text_area("Enter additional information for " + company_1, height=100, key="co1_info")
-            company_2_info = st.text_area("Enter additional information for " + company_2, height=100, key="co2_info")
+            company_1_info = st.text_area("Enter additional information for " + company_1, height=100, key="co1_info",
+                                          on_change=schedule_prefetch, args=("company_info_buyer",))
+            company_2_info = st.text_area("Enter additional information for " + company_2, height=100, key="co2_info",
+                                          on_change=schedule_prefetch, args=("company_info_target",))
+        st.toggle("Prepare company profiles while I type", key="prefetch_profiles", on_change=schedule_prefetch,
+                  help="Starts the company information step in the background once a name stops changing.")
     if company_clicked:
         co1 = st.session_state.get("co1", "").strip()
         co2 = st.session_state.get("co2", "").strip()
@@ -84,164 +145,225 @@ if st.session_state.stage =="input":
         if not co1 or not co2:
             st.error("Please enter both company names.")
         else:
-            st.session_state.stage = "running"
+            # widget values are dropped once the form is gone; a resumed run still needs them
+            run_inputs = {key: st.session_state.get(key, "") for key in ("co1", "co1_info", "co2", "co2_info")}
+            # profiles prefetched from the input form are picked up whether they are finished or still running
+            prefetched = {}
+            for slot in PROFILE_SLOTS:
+                future = PREFETCHER.claim(slot, profile_slot_input(slot), st.session_state.session_id)
+                if future is not None:
+                    prefetched[slot] = future
+            start_job(run_inputs, prefetched)
             st.rerun()
             
 #stage: running
 if st.session_state.stage == "running":
-    
-    co1 = st.session_state.get("co1", "")
-    co2 = st.session_state.get("co2", "")
-    co1_info = st.session_state.get("co1_info", "")
-    co2_info = st.session_state.get("co2_info", "")
-
-    placeholder = st.empty()  # Placeholder for status messages
-    #run agent
-    with placeholder.container():
-        stage1 = st.status("Getting company information...", expanded=True)
-        # time.sleep(0.2)
-        with stage1:
-            #generate company information:
-
-            co1_answer = AGENT_REGISTRY["company_info_buyer"].run({
-                "company_name": co1,
-                "company_description": co1_info
-            })
-
-            co2_answer = AGENT_REGISTRY["company_info_target"].run({
-                "company_name": co2,    
-                "company_description": co2_info
-            })
-            
-            
-
-            st.session_state.co1_info = clean_json_output(co1_answer.content)
-            st.session_state.co2_info = clean_json_output(co2_answer.content)
-            stage1.success("Company information retrieved successfully!")
-            # st.chat_message("Company Information").text("Company information generated successfully!")
-
-            # st.chat_message("Company Information").json(json1)
-            # st.chat_message("Company Information").json(json2)
-        stage2 = st.status("Running Strategy Agent...", expanded=True)
-        # time.sleep(0.2)
-        with stage2:
-            #generate strategy information:
-            co1_answer = st.session_state.co1_info
-            co2_answer = st.session_state.co2_info
-
-            input_data = {
-                "buyer": json.loads(co1_answer),
-                "target": json.loads(co2_answer)
-            }
-            input_data = json.dumps(input_data, indent=2)
-            strategy_answer = AGENT_REGISTRY["strategy"].run(input_data)
-            st.session_state.strategy_info = clean_json_output(strategy_answer.content)
-            stage2.success("Strategy information retrieved successfully!")
-            
-        
-            # st.chat_message("Strategy Information").markdown(strategy_answer.content)
-            
-        stage3 = st.status("Running Valuation Agent...", expanded=True)
-        with stage3:
-            input_data = {
-                "strategy": st.session_state.strategy_info,
-                "company_data": input_data
-            }
-            valuation_answer = AGENT_REGISTRY["valuation"].run(input_data)
-            st.session_state.valuation_info = clean_json_output(valuation_answer.content)
-            stage3.success("Valuation information retrieved successfully!")
-
-            # st.chat_message("Valuation Information").markdown(valuation_answer.content)
-        if (company_file_exists(co1) and company_file_exists(co2)):
-            stage_ex1 = st.status("Found company financial reports in database, Creating chart...")
-            with stage_ex1:
-                # Create the chart using the financial reports
-                df1 = load_company_data(co1) 
-                df2 = load_company_data(co2)
-                df1["Company"] = co1
-                df2["Company"] = co2
-                combined_df = pd.concat([df1, df2])
-                chart_plan = analyze_two_companies([co1, co2], combined_df)
-                st.session_state.chart_plan = chart_plan
-                st.session_state.df = combined_df
-
-                stage_ex1.success("Chart created successfully!")
-        else:
-            st.session_state.chart_plan = "[]"
-            st.session_state.df = pd.DataFrame()
-            
-            stage_ex1 = st.status("No company financial reports found in database. Skipping chart creation.")
-
-        stage4 = st.status("Running Due Diligence Agent...", expanded=True)
-        with stage4:
-            # Run the due diligence agent
-            input_data["valuation"] = st.session_state.valuation_info
-            
-            due_diligence_answer = AGENT_REGISTRY["due_diligence"].run(input_data)
 
-            stage4.success("Due Diligence analysis completed successfully!")
-            st.session_state.due_diligence_info = clean_json_output(due_diligence_answer.content)
-
-            st.session_state.stage = "result"
+    job_id = st.session_state.job_id
+    run_inputs = st.session_state.run_inputs
+    co1, co2 = run_inputs["co1"], run_inputs["co2"]
+    has_reports = has_financial_reports(co1, co2)
+    job = JOB_STORE.get(job_id)
+
+    if job is None:
+        # expired from the job store, or the store was cleared; nothing is left to follow
+        start_over()
+        st.session_state.job_notice = "This analysis is no longer available. Please start a new one."
+        st.rerun()
+
+    if job["status"] == "complete":
+        outputs = load_outputs(job["outputs"])
+        # not co1_info/co2_info: those are the description widgets' keys, cleared while the form is hidden
+        st.session_state.co1_profile = outputs["co1"]
+        st.session_state.co2_profile = outputs["co2"]
+        st.session_state.strategy_info = outputs["strategy"]
+        st.session_state.valuation_info = outputs["valuation"]
+        st.session_state.due_diligence_info = outputs["due_diligence"]
+        st.session_state.chart_plan = outputs["chart_plan"]
+        st.session_state.df = outputs["df"]
+        st.session_state.telemetry = telemetry.RunTelemetry.resume(job_id)
+        st.session_state.run_wall_time = job["finished_at"] - job["started_at"]
+        st.session_state.stage = "result"
+        st.rerun()
+
+    if job["status"] == "failed":
+        st.error(f"The analysis stopped: {job['error']}. Completed stages are saved; resuming continues from there.")
+        r1, r2 = st.columns(2)
+        r1.button("Resume", use_container_width=True, on_click=start_job, args=(run_inputs,))
+        r2.button("Start over", use_container_width=True, on_click=start_over)
+        st.stop()
+
+    node_labels = {
+        "company_info_buyer": f"{co1} profile",
+        "company_info_target": f"{co2} profile",
+        "strategy": "Strategy analysis",
+        "valuation": "Valuation analysis",
+        "chart_plan": "Chart plan",
+        "due_diligence": "Due diligence analysis",
+    }
+    stage_blocks = [
+        ("Getting company information...", "Company information retrieved successfully!",
+         ["company_info_buyer", "company_info_target"]),
+        ("Running Strategy Agent...", "Strategy information retrieved successfully!", ["strategy"]),
+        ("Running Valuation Agent...", "Valuation information retrieved successfully!", ["valuation"]),
+        ("Found company financial reports in database, Creating chart...", "Chart created successfully!",
+         ["chart_plan"]),
+        ("Running Due Diligence Agent...", "Due Diligence analysis completed successfully!", ["due_diligence"]),
+    ]
+
+    @st.fragment(run_every=JOB_POLL_SECONDS)
+    def show_progress():
+        # redrawn from the job store on every poll, so a reloaded page shows the same progress
+        events = JOB_STORE.events(job_id)
+        tokens = JOB_QUEUE.live_tokens(job_id)
+        for label, done_label, nodes in stage_blocks:
+            if nodes == ["chart_plan"] and not has_reports:
+                st.status("No company financial reports found in database. Skipping chart creation.", state="complete")
+                continue
+            finished, failed = set(), False
+            block = st.status(label, expanded=True)
+            streaming = {}
+            for node, state, detail in events:
+                if node not in nodes:
+                    continue
+                node_label = node_labels[node]
+                if state == "running":
+                    block.write(f"⏳ {node_label} started")
+                    streaming[node] = block.empty()
+                elif state == "partial":
+                    block.caption(f"{node_label}: {detail} ready")
+                elif state in ("complete", "restored"):
+                    finished.add(node)
+                    if node in streaming:
+                        streaming.pop(node).empty()
+                    block.write(f"✅ {node_label} done" if state == "complete"
+                                else f"♻️ {node_label} restored from checkpoint")
+                elif state == "error":
+                    failed = True
+                    block.error(f"{node_label} failed: {detail}")
+            for node, slot in streaming.items():
+                if tokens.get(node):
+                    # only the tail is shown; long JSON answers would otherwise flood the page
+                    slot.code(tokens[node][-STREAM_PREVIEW_CHARS:], language="json")
+            if failed:
+                block.update(state="error")
+            elif finished >= set(nodes):
+                block.update(label=done_label, state="complete")
+        job = JOB_STORE.get(job_id)
+        if job is None or job["status"] in FINISHED:
             st.rerun()
 
+    show_progress()
+
 if st.session_state.stage == "result":
     st.success("Analysis completed successfully!")
+    artifacts = ArtifactStore(st.session_state)
+    polish = st.toggle("Polish report wording with AI (slower)", key="polish_report")
+    formatter = AGENT_REGISTRY["formatter_polish" if polish else "formatter"]
     progress_bar = st.progress(0, text="Generating final report...")
-    with st.spinner(f"{st.session_state.co1} information..."):
-        company_1_html = AGENT_REGISTRY["formatter"].run(st.session_state.co1_info)
-    with st.spinner(f"{st.session_state.co2} information..."):
-        progress_bar.progress(20, text="Generating final report...")
-        company_2_html = AGENT_REGISTRY["formatter"].run(st.session_state.co2_info)
-    with st.spinner("Generating Strategy report..."):
-        progress_bar.progress(40, text="Generating final report...")
-        strategy_html = AGENT_REGISTRY["formatter"].run(st.session_state.strategy_info)
-    with st.spinner("Generating Valuation report..."):
-        progress_bar.progress(60, text="Generating final report...")
-        valuation_html = AGENT_REGISTRY["formatter"].run(st.session_state.valuation_info)
-    with st.spinner("Generating Due Diligence report..."):
-        progress_bar.progress(80, text="Generating final report...")
-        due_diligence_html = AGENT_REGISTRY["formatter"].run(st.session_state.due_diligence_info)
-    with st.spinner("Getting pdf ready..."):
-        progress_bar.progress(95, text="Generating final report...")
-         #for download:
-        charts_arr = read_charts(st.session_state.chart_plan)
-        chart_fig_arr = get_charts_fig(charts_arr, st.session_state.df)
-        chart_fig_analysis = get_charts_analysis(charts_arr)
-        
-        report= generate_report.ReportGenerator(
-            co1=company_1_html.content,
-            co2=company_2_html.content,
-            strat=strategy_html.content,
-            var=valuation_html.content,
-            chart=chart_fig_arr,
-            chart_analysis=chart_fig_analysis,
-            due=due_diligence_html.content
-        )
-        
-        
 
+    # one slot per section, in report order, so each section shows up as soon as it is formatted
+    sections = {
+        "co1": st.session_state.co1_profile,
+        "co2": st.session_state.co2_profile,
+        "strategy": st.session_state.strategy_info,
+        "valuation": st.session_state.valuation_info,
+        "due_diligence": st.session_state.due_diligence_info,
+    }
+    section_versions = {key: fingerprint(value, polish) for key, value in sections.items()}
+    slots = {key: st.empty() for key in ["co1", "co2", "strategy", "valuation"]}
+    chart_area = st.container()
+    slots["due_diligence"] = st.empty()
+
+    # reruns reuse every section whose input is unchanged; only stale ones go to the formatter
+    section_html = {}
+    stale = {}
+    for key, value in sections.items():
+        cached = artifacts.get(f"html:{key}", section_versions[key])
+        if cached is None:
+            stale[key] = value
+            slots[key].info("Formatting section...")
+        else:
+            section_html[key] = cached
+            slots[key].html(cached)
+
+    with telemetry.activate(st.session_state.telemetry), rate_limiter.session(st.session_state.session_id):
+        for key, result in formatter.run_batch(stale):
+            section_html[key] = artifacts.put(f"html:{key}", section_versions[key], result.content)
+            slots[key].html(result.content)
+            progress_bar.progress(int(len(section_html) / (len(sections) + 1) * 100), text="Generating final report...")
+
+    charts_version = fingerprint(st.session_state.chart_plan, st.session_state.df)
+
+    chart_fig_arr, chart_fig_analysis = artifacts.memoize(
+        "charts", charts_version, lambda: build_charts(st.session_state.chart_plan, st.session_state.df)
+    )
     progress_bar.empty()
-        # Here you would generate the report based on the analysis
 
-    st.html(company_1_html.content)
-    st.html(company_2_html.content)
-    st.html(strategy_html.content)
-    st.html(valuation_html.content)
     if st.session_state.chart_plan != "[]":
-        render_charts(st.session_state.chart_plan, st.session_state.df)
-        st.write(chart_fig_analysis)
-    st.html(due_diligence_html.content)
-
-
-    pdf_file = report.to_pdf()
-    with st.spinner("Generating PDF..."):
-        st.download_button(
-            label="📥 Download Full Report as PDF",
-            data=report.to_pdf(),
-            file_name="report.pdf",
-            mime="application/pdf"
-        )
+        with chart_area:
+            render_figs(chart_fig_arr)
+            st.write(chart_fig_analysis)
+
+    def build_pdf():
+        return build_report(section_html, chart_fig_arr, chart_fig_analysis).to_pdf()
+
+    pdf_version = fingerprint(section_versions, charts_version)
+    if not artifacts.has("pdf", pdf_version):
+        with st.spinner("Getting pdf ready..."):
+            artifacts.memoize("pdf", pdf_version, build_pdf)
+    st.download_button(
+        label="📥 Download Full Report as PDF",
+        data=artifacts.get("pdf", pdf_version),
+        file_name="report.pdf",
+        mime="application/pdf"
+    )
+
+    # profiles written by the LLM are only reused for later runs once someone has checked them
+    new_profiles = [
+        (role, st.session_state.run_inputs[name_key], st.session_state[info_key])
+        for role, name_key, info_key in [("buyer", "co1", "co1_profile"), ("target", "co2", "co2_profile")]
+        if PROFILE_STORE.lookup(st.session_state.run_inputs[name_key], role) is None
+    ]
+    if new_profiles:
+        with st.expander("Save company profiles for later runs"):
+            approved = [
+                profile for profile in new_profiles
+                if st.checkbox(f"{profile[1]} ({profile[0]}) profile is correct", key=f"approve_profile_{profile[0]}")
+            ]
+            if st.button("Save approved profiles to the profile store", disabled=not approved):
+                saved = True
+                for role, name, content in approved:
+                    try:
+                        PROFILE_STORE.put(name, role, clean_json_output(content), source="llm",
+                                          approved_by=st.session_state.session_id)
+                    except ValueError:
+                        saved = False
+                        st.warning(f"The {name} profile is not valid JSON and was not saved.")
+                if saved:
+                    st.rerun()
+
+
+
+    with st.expander("Run telemetry"):
+        run_telemetry = st.session_state.telemetry
+        calls = run_telemetry.to_frame()
+        if calls.empty:
+            st.write("No agent calls were recorded for this run.")
+        else:
+            m1, m2, m3, m4 = st.columns(4)
+            m1.metric("Pipeline wall time", f"{st.session_state.run_wall_time:.1f}s")
+            m2.metric("LLM calls", int((calls["cache"] != "local").sum()))
+            m3.metric("Tokens", int(calls["prompt_tokens"].fillna(0).sum() + calls["completion_tokens"].fillna(0).sum()))
+            m4.metric("Cost", f"${calls['cost_usd'].fillna(0).sum():.4f}")
+            st.dataframe(run_telemetry.summary())
+            st.caption(f"Trace: {run_telemetry.trace_path}")
+        st.caption("Rate limiter (all sessions)")
+        st.json(rate_limiter.limiter_stats(), expanded=False)
+        st.caption("Identical in-flight LLM calls shared between sessions")
+        st.json(get_single_flight().stats, expanded=False)
+        st.caption("Model routing: measured latency and valid answers per model")
+        st.json(get_router().snapshot(), expanded=False)
 
 
 
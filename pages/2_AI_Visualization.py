@@ -1,7 +1,7 @@
 import streamlit as st
-import pandas as pd
-from ai_visualization.data_loader import load_company_data
-from ai_visualization.llm_agent import analyze_two_companies, summarize_df
+from ai_visualization.catalog import get_catalog
+from ai_visualization.data_loader import load_companies
+from ai_visualization.llm_agent import analyze_companies, summarize_df
 from ai_visualization.chart_generator import render_charts
 
 
@@ -15,31 +15,27 @@ st.title("📊 Data PoodPard")
 
 st.subheader("AI Chart Visualization")
 st.write("This is the AI chart visualization page.")
-companies = ["Centel", "iberry"]
-# Create two columns for side-by-side dropdowns
-col1, col2 = st.columns(2)
-with col1:
-    company_1 = st.selectbox("Select first company", companies, key="company_1")
-with col2:
-    remaining_companies = [c for c in companies if c != company_1]
-    company_2 = st.selectbox("Select second company", remaining_companies, key="company_2")
+# every company with a financials file under data/
+companies = get_catalog().companies()
+if len(companies) < 2:
+    st.info("Add at least two company financial files (.csv or .xlsx) to the data folder to compare them.")
+    st.stop()
+selected = st.multiselect("Select companies to compare", companies, default=companies[:2], key="companies")
+if len(selected) < 2:
+    st.caption("Select at least two companies.")
 
 
-if company_1 and company_2 and st.button("Compare Companies"):
+if len(selected) >= 2 and st.button("Compare Companies"):
     status_placeholder = st.empty()  # placeholder to update messages dynamically
 
     with st.spinner("Loading company report..."):
-        df1 = load_company_data(company_1)
-        df2 = load_company_data(company_2)
-
-        df1["Company"] = company_1
-        df2["Company"] = company_2
-        combined_df = pd.concat([df1, df2])
+        # loaded in parallel and combined once; Company is categorical in the selected order
+        combined_df = load_companies(selected)
         
 
     
     with st.spinner("AI Agent Analyzing data..."):
-        chart_plan = analyze_two_companies([company_1, company_2], combined_df)
+        chart_plan = analyze_companies(selected, combined_df)
 
     
     with st.spinner("Generating charts..."):
@@ -0,0 +1,72 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from ai_visualization.data_store import CompanyDataStore
+from ai_visualization.derived_metrics import (
+    FILLED_ROWS, KEY_METRICS_CATEGORY, fill_parent_totals, key_metrics, with_derived_metrics,
+)
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+COMPANIES = ("centel", "iberry")
+
+
+@pytest.fixture(scope="module")
+def statements(tmp_path_factory):
+    store = CompanyDataStore(tmp_path_factory.mktemp("data_cache"))
+    return {name: store.load_file(DATA_DIR / f"{name}.csv") for name in COMPANIES}
+
+
+def reported_rows(frame):
+    rows = frame[frame["Subcategory"].isin(FILLED_ROWS)]
+    return rows.assign(Value=pd.to_numeric(rows["Value"], errors="coerce")).dropna(subset=["Value"])
+
+
+@pytest.mark.parametrize("name", COMPANIES)
+def test_key_metrics_match_reported_figures(statements, name):
+    metrics = key_metrics(fill_parent_totals(statements[name]))
+    rows = reported_rows(statements[name])
+    # EPS growth is computed from the rounded per-share figures, so it is not expected to match
+    rows = rows[rows["Subcategory"].map(FILLED_ROWS) != "EPS Growth%"]
+    assert not rows.empty
+    for row in rows.itertuples():
+        assert metrics.loc[row.Year, FILLED_ROWS[row.Subcategory]] == pytest.approx(row.Value, abs=1e-3)
+
+
+@pytest.mark.parametrize("name", COMPANIES)
+def test_derived_key_metrics_use_reported_figures(statements, name):
+    enriched = with_derived_metrics(statements[name])
+    metrics = enriched[enriched["Category"] == KEY_METRICS_CATEGORY].set_index(["Year", "Subcategory"])["Value"]
+    rows = reported_rows(statements[name])
+    assert not rows.empty
+    for row in rows.itertuples():
+        assert metrics[(row.Year, FILLED_ROWS[row.Subcategory])] == row.Value
+
+
+def test_growth_follows_the_statements():
+    frame = pd.DataFrame({
+        "Category": "Income Statement",
+        "Subcategory": ["Revenues", "Net Income"] * 2,
+        "IsParent": False,
+        "Year": [2022, 2022, 2023, 2023],
+        "Value": [100.0, -40.0, 120.0, -10.0],
+    })
+    metrics = key_metrics(frame)
+    assert metrics.loc[2023, "Revenue Growth%"] == pytest.approx(0.2)
+    # a smaller loss is negative growth, as in the statements' own growth rows
+    assert metrics.loc[2023, "Net Income Growth%"] == pytest.approx(-0.75)
+    assert metrics.loc[2023, "Net Margin%"] == pytest.approx(-10 / 120)
+
+
+def test_empty_reported_rows_are_filled():
+    frame = pd.DataFrame({
+        "Category": "Income Statement",
+        "Subcategory": ["Revenues", "Total Revenue Growth%"] * 2,
+        "IsParent": False,
+        "Year": [2022, 2022, 2023, 2023],
+        "Value": [100.0, None, 150.0, None],
+    })
+    enriched = with_derived_metrics(frame)
+    filled = enriched[(enriched["Subcategory"] == "Total Revenue Growth%") & (enriched["Year"] == 2023)]
+    assert filled["Value"].tolist() == [pytest.approx(0.5)]
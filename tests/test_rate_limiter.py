@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from ai_analysis import rate_limiter
+from ai_analysis.rate_limiter import RateLimiter
+
+USAGE = {"input_tokens": 30, "output_tokens": 20, "total_tokens": 50}
+
+
+class FakeLLM:
+    model_name = "test-model"
+    max_tokens = 100
+
+    def __init__(self, error=None, chunks=3, usage=True):
+        self.error = error
+        self.chunks = chunks
+        self.usage = usage
+
+    def _message(self):
+        return AIMessage(content="ok", usage_metadata=USAGE if self.usage else None)
+
+    def invoke(self, prompt):
+        if self.error is not None:
+            raise self.error
+        return self._message()
+
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(0)
+        if self.error is not None:
+            raise self.error
+        return self._message()
+
+    def stream(self, prompt, **kwargs):
+        if self.error is not None:
+            raise self.error
+        for _ in range(self.chunks):
+            yield AIMessageChunk(content="x")
+
+    async def astream(self, prompt, **kwargs):
+        for _ in range(self.chunks):
+            await asyncio.sleep(0.01)
+            yield AIMessageChunk(content="x")
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    limiter = RateLimiter(rpm=1000, tpm=100_000)
+    # no refill during the test, so the bucket level shows exactly what was settled
+    limiter.tokens.rate = 1e-6
+    monkeypatch.setattr(rate_limiter, "get_limiter", lambda model: limiter)
+    return limiter
+
+
+def spent(limiter):
+    return round(limiter.tokens.capacity - limiter.tokens.level)
+
+
+def test_invoke_settles_reported_usage(limiter):
+    rate_limiter.invoke(FakeLLM(), "hello")
+    assert spent(limiter) == USAGE["total_tokens"]
+
+
+def test_invoke_without_usage_keeps_estimate(limiter):
+    rate_limiter.invoke(FakeLLM(usage=False), "hello")
+    assert spent(limiter) == rate_limiter._estimate(FakeLLM(), "hello")
+
+
+def test_failed_invoke_keeps_estimate(limiter):
+    with pytest.raises(ValueError):
+        rate_limiter.invoke(FakeLLM(error=ValueError("bad request")), "hello")
+    assert spent(limiter) == rate_limiter._estimate(FakeLLM(), "hello")
+
+
+def test_cancelled_ainvoke_keeps_estimate(limiter):
+    class SlowLLM(FakeLLM):
+        async def ainvoke(self, prompt):
+            await asyncio.sleep(10)
+
+    async def cancel():
+        task = asyncio.create_task(rate_limiter.ainvoke(SlowLLM(), "hello"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel())
+    assert spent(limiter) == rate_limiter._estimate(FakeLLM(), "hello")
+
+
+def test_stream_closed_early_keeps_estimate(limiter):
+    chunks = rate_limiter.stream(FakeLLM(), "hello")
+    next(chunks)
+    chunks.close()
+    assert spent(limiter) == rate_limiter._estimate(FakeLLM(), "hello")
+
+
+def test_astream_cancelled_before_first_chunk_is_refunded(limiter):
+    async def cancel():
+        async def consume():
+            async for _ in rate_limiter.astream(FakeLLM(), "hello"):
+                pass
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.001)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel())
+    assert spent(limiter) == 0
+
+
+def test_acquire_cancelled_after_grant_gives_tokens_back():
+    limiter = RateLimiter(rpm=1000, tpm=10_000)
+    limiter.tokens.rate = 1e-6
+    limiter.tokens.level = 0
+
+    async def cancel():
+        task = asyncio.create_task(limiter.aacquire(500))
+        await asyncio.sleep(0.01)
+        # the grant happens, but the waiter is cancelled before it resumes
+        limiter.tokens.level = 500
+        limiter._dispatch()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancel())
+    assert round(limiter.tokens.level) == 500
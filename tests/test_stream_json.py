@@ -0,0 +1,68 @@
+import json
+
+from ai_analysis.stream_json import StreamingJSONParser
+
+ANSWER = {"strategicSummary": {"fit": "high", "risks": ["a", "b"]}, "valuationGuidance": "range", "score": 7}
+
+
+def feed_all(parser, text, size=3):
+    completed = []
+    for i in range(0, len(text), size):
+        completed += parser.feed(text[i:i + size])
+    return completed
+
+
+def test_fields_reported_as_they_close():
+    parser = StreamingJSONParser(max_depth=1)
+    completed = feed_all(parser, json.dumps(ANSWER))
+    assert completed == [
+        (("strategicSummary",), ANSWER["strategicSummary"]),
+        (("valuationGuidance",), "range"),
+        (("score",), 7),
+    ]
+    assert parser.done
+    assert parser.result() == ANSWER
+
+
+def test_nested_fields_up_to_max_depth():
+    parser = StreamingJSONParser(max_depth=2)
+    paths = [path for path, value in feed_all(parser, json.dumps(ANSWER), size=1)]
+    assert paths == [("strategicSummary", "fit"), ("strategicSummary", "risks"), ("strategicSummary",),
+                     ("valuationGuidance",), ("score",)]
+
+
+def test_fenced_answer():
+    parser = StreamingJSONParser(max_depth=1)
+    text = "Sure, here it is:\n```json\n" + json.dumps({"a": "x}", "b": [1, 2]}) + "\n```\nAnything else {?}"
+    assert feed_all(parser, text) == [(("a",), "x}"), (("b",), [1, 2])]
+    assert parser.result() == {"a": "x}", "b": [1, 2]}
+
+
+def test_fence_on_the_same_line():
+    parser = StreamingJSONParser(max_depth=1)
+    assert feed_all(parser, '```json {"a": 1}```') == [(("a",), 1)]
+
+
+def test_brackets_in_prose_are_not_the_root():
+    parser = StreamingJSONParser(max_depth=1)
+    assert feed_all(parser, 'Scores [1, 2] are below:\n{"a": 1}') == [(("a",), 1)]
+    assert parser.result() == {"a": 1}
+
+
+def test_root_that_is_not_json_is_dropped():
+    parser = StreamingJSONParser(max_depth=1)
+    assert feed_all(parser, '{see below}\n{"a": [1, 2}, "b": 3}\n{"ok": true}') == [(("ok",), True)]
+    assert parser.result() == {"ok": True}
+
+
+def test_mid_line_json_still_gives_a_result():
+    parser = StreamingJSONParser(max_depth=1)
+    feed_all(parser, 'Here [is] the JSON: {"a": 1}')
+    assert parser.result() == {"a": 1}
+
+
+def test_unfinished_answer_has_no_result():
+    parser = StreamingJSONParser(max_depth=1)
+    assert feed_all(parser, '{"a": 1, "b": {"c"') == [(("a",), 1)]
+    assert not parser.done
+    assert parser.result() is None